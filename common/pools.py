@@ -0,0 +1,17 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods
+from multiprocessing import get_context
+from typing import Callable
+from typing import Optional
+from typing import Tuple
+
+
+def process_pool(workers: Optional[int], initializer: Optional[Callable] = None,
+                 initargs: Tuple = ()) -> ProcessPoolExecutor:
+    """
+    The process pool shared by the parallel runs of every task. fork keeps the task
+    scripts from being re-executed in every worker.
+    """
+    context = get_context('fork') if 'fork' in get_all_start_methods() else None
+    return ProcessPoolExecutor(workers, mp_context = context, initializer = initializer,
+                               initargs = initargs)
@@ -1 +1,4 @@
+from .brv_supplier import AliasSampler
+from .brv_supplier import CumulativeSampler
+from .brv_supplier import MultiDimensionalRandomValue
 from .brv_supplier import TwoDimensionalRandomValue
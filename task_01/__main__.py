@@ -5,6 +5,7 @@ from numpy import sum
 
 import task_01.brv_supplier as sup
 import task_01.investigator as inv
+import task_01.parallel as par
 
 
 def draw_histogram(A, B, empiric_matrix, theoretic_matrix):
@@ -29,27 +30,20 @@ def print_interval_estimation(no: int, n, M, D, probabilities_for_M_int,
     print(f'<<<----     Интервальные оценки для x{no}     ---->>>', '\nДля мат. ожидания:')
 
     fig, axs = plt.subplots(2)
-    deltas = []
-    for prob in probabilities_for_M_int:
-        delta, interval = investigator.M_confidence_interval(n, M, D, prob)
-        deltas.append(delta)
+    deltas, intervals = investigator.M_confidence_intervals(n, D, M, probabilities_for_M_int)
+    for prob, interval in zip(probabilities_for_M_int, intervals.tolist()):
         print('Доверительный интервал для мат. ожидания при доверительной вероятности',
               f'{prob} и n = {n}: {str(interval)}')
-    axs[0].plot(probabilities_for_M_int, list(map(lambda x: x * 2, deltas)))
+    axs[0].plot(probabilities_for_M_int, deltas * 2)
     axs[0].legend([f'x{no} interval for M'])
 
     print('\nДля дисперсии:')
-    deltas = []
-    D_probs = []
-    intervals = []
-    for prob in probabilities_for_D_int:
-        delta, interval = investigator.D_confidence_interval(n, D, M, prob)
-        deltas.append(delta)
-        D_probs.append(prob[1])
-        intervals.append(interval)
+    D_probs = [prob[1] for prob in probabilities_for_D_int]
+    deltas, intervals = investigator.D_confidence_intervals(n, D, M, probabilities_for_D_int)
+    for prob, interval in zip(D_probs, intervals.tolist()):
         print('Доверительный интервал для дисперсии при доверительной вероятности',
-              f'{prob[1]} и n = {n}: {str(interval)}')
-    axs[1].plot(D_probs, list(map(lambda x: x[1] - x[0], intervals)))
+              f'{prob} и n = {n}: {str(interval)}')
+    axs[1].plot(D_probs, intervals[:, 1] - intervals[:, 0])
     axs[1].legend([f'x{no} interval for D'])
 
     print('>>>----     --------------------------     ----<<<\n')
@@ -65,31 +59,40 @@ P = array([
 A = array([1, 2, 4])
 B = array([1, 3])
 
+seed = 2021
+workers = None  # all cores
+
 ####
 
 print('Теоретическая матрица:')
 print(P, "\n")
 
 empiric_matrix: ndarray
-investigator = inv.Investigator(P, A, B, sup.TwoDimensionalRandomValue.get)
-print('Эмпирическая матрица (n = 100):\n', investigator.build_empiric_matrix(100), '\n')
-print('Эмпирическая матрица (n = 1000):\n', investigator.build_empiric_matrix(1000), '\n')
-print('Эмпирическая матрица (n = 10000):\n', investigator.build_empiric_matrix(10000), '\n')
+investigator = inv.Investigator(P, A, B, sup.TwoDimensionalRandomValue.get,
+                                sup.AliasSampler(P, A, B))
+print('Эмпирическая матрица (n = 100):\n',
+      investigator.build_empiric_matrix(100, seed = seed, workers = workers), '\n')
+print('Эмпирическая матрица (n = 1000):\n',
+      investigator.build_empiric_matrix(1000, True, seed, workers), '\n')
+print('Эмпирическая матрица (n = 10000):\n',
+      investigator.build_empiric_matrix(10000, True, seed, workers), '\n')
 print('Эмпирическая матрица (n = 100000):\n',
-      empiric_matrix := investigator.build_empiric_matrix(100000),
+      empiric_matrix := investigator.build_empiric_matrix(100000, True, seed, workers),
       '\n')
 draw_histogram(A, B, empiric_matrix, P)
 
 n = 10000
-X = array([sup.TwoDimensionalRandomValue.get(P, A, B) for i in range(n)])
+X = par.draw_sample(sup.AliasSampler(P, A, B), n, seed, workers)
 x1v, x2v = X[:, 0], X[:, 1]
 
-M_x1 = investigator.M_point_estimation(x1v, n)
-M_x2 = investigator.M_point_estimation(x2v, n)
+moments_x1, moments_x2 = investigator.moments(x1v), investigator.moments(x2v)
+
+M_x1 = moments_x1.mean
+M_x2 = moments_x2.mean
 print('Точечные оценки мат. ожидания:\n\tДля x1:', str(M_x1), '\n\tДля x2:', str(M_x2), '\n')
 
-D_x1 = investigator.D_point_estimation(x1v, n, M_x1)
-D_x2 = investigator.D_point_estimation(x2v, n, M_x2)
+D_x1 = moments_x1.variance
+D_x2 = moments_x2.variance
 print('Точечные оценки дисперсии:\n\tДля x1:', str(D_x1), '\n\tДля x2:', str(D_x2), '\n')
 
 probabilities_for_M_int = [0.9, 0.95, 0.98, 0.99]
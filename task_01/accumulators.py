@@ -0,0 +1,141 @@
+import math
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+
+from numpy import asarray
+from numpy import bincount
+from numpy import int64
+from numpy import ndarray
+from numpy import zeros
+from numpy.random import Generator
+from scipy.sparse import csr_matrix
+
+
+class EmpiricMatrixAccumulator:
+    """
+    Counts drawn (row, col) index pairs straight into an integer matrix. Draws are
+    made in fixed-size chunks, so memory does not depend on the sample size, and the
+    sample can be extended later instead of being redrawn from scratch.
+
+    support -- (rows, cols) of the nonzero cells of a sparse distribution. If given,
+    only those cells are counted (the sampler must provide get_cells, positions in
+    the support) and matrix() is sparse.
+    """
+
+    def __init__(self, shape: Tuple[int, int], sampler, chunk_size: int = 1000000,
+                 support: Optional[Tuple[ndarray, ndarray]] = None):
+        self._shape = shape
+        self._sampler = sampler
+        self._chunk_size = chunk_size
+        self._support = support
+        self.counts = zeros(shape if support is None else len(support[0]), dtype = int64)
+        self.sample_size = 0
+
+
+    def extend(self, sample_size: int, rng: Optional[Generator] = None) \
+            -> 'EmpiricMatrixAccumulator':
+        n, m = self._shape
+        counts = self.counts.ravel()
+
+        left = sample_size
+        while left > 0:
+            chunk = min(left, self._chunk_size)
+            if self._support is None:
+                rows, cols = self._sampler.get_indices(chunk, rng)
+                counts += bincount(rows * m + cols, minlength = n * m)
+            else:
+                counts += bincount(self._sampler.get_cells(chunk, rng), minlength = len(counts))
+            left -= chunk
+
+        self.sample_size += sample_size
+        return self
+
+
+    def extend_to(self, sample_size: int, rng: Optional[Generator] = None) \
+            -> 'EmpiricMatrixAccumulator':
+        return self.extend(max(sample_size - self.sample_size, 0), rng)
+
+
+    def add(self, counts: ndarray, sample_size: int) -> 'EmpiricMatrixAccumulator':
+        self.counts += counts
+        self.sample_size += sample_size
+        return self
+
+
+    def matrix(self) -> ndarray:
+        if self._support is None:
+            return self.counts / self.sample_size
+        return csr_matrix((self.counts / self.sample_size, self._support), shape = self._shape)
+
+
+class MomentAccumulator:
+    """
+    Single-pass count / mean / M2 accumulator (Welford, Chan et al. for merging).
+    Partial states built over separate chunks or in separate processes merge into
+    the same state a single pass over all of the samples would give.
+    """
+
+    def __init__(self, compensated: bool = False):
+        self._compensated = compensated  # use math.fsum for per-chunk sums
+        self.count = 0
+        self.mean = 0.0
+        self.M2 = 0.0
+
+
+    def update(self, chunk) -> 'MomentAccumulator':
+        chunk = asarray(chunk, dtype = float).ravel()
+        k = len(chunk)
+        if k == 0:
+            return self
+
+        if self._compensated:
+            chunk_mean = math.fsum(chunk.tolist()) / k
+            deviations = chunk - chunk_mean
+            chunk_M2 = math.fsum((deviations * deviations).tolist())
+        else:
+            chunk_mean = float(chunk.mean())
+            deviations = chunk - chunk_mean
+            chunk_M2 = float(deviations @ deviations)
+
+        return self._combine(k, chunk_mean, chunk_M2)
+
+
+    def update_from(self, samples: Iterable, chunk_size: int = 65536) -> 'MomentAccumulator':
+        """
+        samples -- NumPy chunks and/or scalars, e.g. a generator over a stream that
+        does not fit in memory. Scalars are buffered into chunks of chunk_size.
+        """
+        buffer = []
+        for sample in samples:
+            if isinstance(sample, ndarray):
+                self.update(sample)
+                continue
+            buffer.append(sample)
+            if len(buffer) == chunk_size:
+                self.update(buffer)
+                buffer = []
+
+        return self.update(buffer)
+
+
+    def merge(self, other: 'MomentAccumulator') -> 'MomentAccumulator':
+        if other.count:
+            self._combine(other.count, other.mean, other.M2)
+        return self
+
+
+    def _combine(self, count: int, mean: float, M2: float) -> 'MomentAccumulator':
+        total = self.count + count
+        delta = mean - self.mean
+
+        self.mean += delta * count / total
+        self.M2 += M2 + delta * delta * self.count * count / total
+        self.count = total
+
+        return self
+
+
+    @property
+    def variance(self) -> float:
+        return self.M2 / (self.count - 1)
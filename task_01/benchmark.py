@@ -0,0 +1,143 @@
+"""
+Benchmarks for the task_01 sampling and estimation pipeline.
+
+    python -m task_01.benchmark [--sizes 100 ... ] [--shapes 3x2 ...] [--output results.json]
+
+Every stage is timed on a fresh run and then rerun under tracemalloc for its peak
+memory. With --output the results are also written as JSON, so that runs can be
+compared with each other. Draws per second are reported for the sampling stages only.
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import numpy
+from numpy import arange
+from numpy.random import default_rng
+
+from task_01.brv_supplier import AliasSampler
+from task_01.brv_supplier import CumulativeSampler
+from task_01.brv_supplier import TwoDimensionalRandomValue
+from task_01.brv_supplier import build_alias_table
+from task_01.investigator import Investigator
+
+
+_default_sizes = [10 ** k for k in range(2, 8)]
+_default_shapes = [(3, 2), (10, 10), (100, 100), (500, 500)]
+_legacy_max_size = 10 ** 5  # TwoDimensionalRandomValue.get is a Python loop per draw
+_sampling_stages = {'get', 'build_empiric_matrix', 'cumulative_sampler', 'alias_sampler',
+                    'accumulated_empiric_matrix', 'multinomial_empiric_matrix'}
+
+_probabilities_for_M_int = [0.9, 0.95, 0.98, 0.99]
+_probabilities_for_D_int = [[0.025, 0.975], [0.01, 0.99], [0.005, 0.995]]
+
+
+def _measure(func: Callable) -> Tuple[float, int]:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def _stages(P, A, B, n) -> List[Tuple[str, Callable]]:
+    stages = []
+    if n <= _legacy_max_size:
+        stages.append(('get', lambda: [TwoDimensionalRandomValue.get(P, A, B) for _ in range(n)]))
+        investigator = Investigator(P, A, B, TwoDimensionalRandomValue.get)
+        stages.append(('build_empiric_matrix', lambda: investigator.build_empiric_matrix(n)))
+
+    cumulative = CumulativeSampler(P, A, B)
+    alias = AliasSampler(P, A, B)
+    sampling_investigator = Investigator(P, A, B, None, alias)
+    X = alias.get(n)[:, 0]
+    moments = Investigator.moments(X)
+
+    stages += [
+      ('cumulative_sampler', lambda: cumulative.get(n)),
+      ('alias_sampler', lambda: alias.get(n)),
+      ('accumulated_empiric_matrix', lambda: sampling_investigator.build_empiric_matrix(n)),
+      ('multinomial_empiric_matrix',
+       lambda: sampling_investigator.build_empiric_matrix(n, multinomial = True)),
+      ('M_point_estimation', lambda: Investigator.M_point_estimation(X, n)),
+      ('D_point_estimation', lambda: Investigator.D_point_estimation(X, n, moments.mean)),
+      ('moments', lambda: Investigator.moments(X)),
+      ('M_confidence_intervals', lambda: Investigator.M_confidence_intervals(
+        n, moments.variance, moments.mean, _probabilities_for_M_int)),
+      ('D_confidence_intervals', lambda: Investigator.D_confidence_intervals(
+        n, moments.variance, moments.mean, _probabilities_for_D_int)),
+    ]
+    return stages
+
+
+def run(sizes: List[int], shapes: List[Tuple[int, int]], seed: int = 0) -> List[Dict]:
+    rng = default_rng(seed)
+    records = []
+
+    for shape in shapes:
+        P = rng.random(shape)
+        P /= P.sum()
+        A, B = arange(shape[0]), arange(shape[1])
+
+        elapsed, peak = _measure(lambda: build_alias_table(P))
+        records.append(_record('alias_table_build', shape, 0, elapsed, peak))
+
+        for n in sizes:
+            for stage, func in _stages(P, A, B, n):
+                elapsed, peak = _measure(func)
+                record = _record(stage, shape, n, elapsed, peak)
+                records.append(record)
+                rate = record['draws_per_second']
+                print(f'{stage:>28} {shape[0]:>4}x{shape[1]:<4} n = {n:<10}'
+                      f'{elapsed:>12.6f} s {"-" if rate is None else f"{rate:.0f}":>16} draws/s'
+                      f'{peak / 2 ** 20:>12.2f} MiB')
+
+    return records
+
+
+def _record(stage: str, shape: Tuple[int, int], n: int, elapsed: float, peak: int) -> Dict:
+    return {
+      'stage': stage,
+      'shape': list(shape),
+      'sample_size': n,
+      'seconds': elapsed,
+      'draws_per_second': n / elapsed if stage in _sampling_stages and elapsed else None,
+      'peak_memory_bytes': peak,
+    }
+
+
+def _parse_shape(value: str) -> Tuple[int, int]:
+    n, m = value.lower().split('x')
+    return int(n), int(m)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Benchmarks task_01 hot paths.')
+    parser.add_argument('--sizes', type = int, nargs = '+', default = _default_sizes)
+    parser.add_argument('--shapes', type = _parse_shape, nargs = '+', default = _default_shapes)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--output', help = 'JSON file to write the results to')
+    args = parser.parse_args()
+
+    results = {
+      'created': datetime.now().isoformat(),
+      'python': platform.python_version(),
+      'numpy': numpy.__version__,
+      'machine': platform.machine(),
+      'records': run(args.sizes, args.shapes, args.seed),
+    }
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent = 2)
@@ -1,11 +1,28 @@
+from functools import lru_cache
+from typing import Optional
+from typing import Sequence
 from typing import Tuple
 
+from numpy import arange
 from numpy import array
+from numpy import column_stack
+from numpy import cumsum
+from numpy import divide
+from numpy import divmod
+from numpy import empty
+from numpy import frombuffer
+from numpy import intp
 from numpy import ndarray
+from numpy import ones
 from numpy import searchsorted
 from numpy import shape
 from numpy import sum
+from numpy import where
+from numpy import zeros_like
+from numpy.random import Generator
 from numpy.random import rand
+from scipy.sparse import coo_matrix
+from scipy.sparse import issparse
 
 
 class TwoDimensionalRandomValue:
@@ -33,3 +50,200 @@ class TwoDimensionalRandomValue:
         index = searchsorted(array(Rv), rand() * Rv[-1])
 
         return x1, Bv[index]
+
+
+    @classmethod
+    def get_batch(cls, P_matrix: ndarray, Av: ndarray, Bv: ndarray, size: int) -> ndarray:
+        return CumulativeSampler(P_matrix, Av, Bv).get(size)
+
+
+class CumulativeSampler:
+    """
+    Precompiled two-stage sampler: the marginal CDF of x1 and the conditional CDFs
+    of x2 (one per row of P_matrix) are built once, so that a batch of draws costs
+    two vectorized searchsorted passes.
+    """
+
+    def __init__(self, P_matrix: ndarray, Av: ndarray, Bv: ndarray):
+        self._Av = Av
+        self._Bv = Bv
+        self._n, self._m = shape(P_matrix)
+
+        Qv = sum(P_matrix, axis = TwoDimensionalRandomValue._m_axis)
+        self._Lv = cumsum(Qv)
+
+        """
+        Conditional CDFs are normalized per row and shifted by the row index, so that
+        all of them form one non-decreasing vector: row i occupies [i, i + 1].
+        """
+        Rm = cumsum(P_matrix, axis = TwoDimensionalRandomValue._m_axis)
+        Rm = divide(Rm, Rm[:, -1:], out = zeros_like(Rm, dtype = float), where = Rm[:, -1:] > 0)
+        Rm[:, -1] = 1.0
+        self._Rv = (Rm + arange(self._n)[:, None]).ravel()
+
+
+    def get_indices(self, size: int, rng: Optional[Generator] = None) -> Tuple[ndarray, ndarray]:
+        rows = searchsorted(self._Lv, _uniform(size, rng) * self._Lv[-1], side = 'right')
+        rows[rows >= self._n] = self._n - 1  # guards against rounding in the last bucket
+
+        cells = searchsorted(self._Rv, rows + _uniform(size, rng), side = 'right')
+        cols = cells - rows * self._m
+        cols[cols >= self._m] = self._m - 1
+
+        return rows, cols
+
+
+    def get(self, size: int, rng: Optional[Generator] = None) -> ndarray:
+        rows, cols = self.get_indices(size, rng)
+        return column_stack((self._Av[rows], self._Bv[cols]))
+
+
+class AliasSampler:
+    """
+    Walker/Vose alias table over the flattened joint matrix: every draw costs one
+    bucket pick and one biased coin, no matter how many values A and B have.
+    Tables are cached per distinct matrix.
+
+    P_matrix may also be a scipy.sparse matrix, then only its nonzero cells (support)
+    are stored and drawn, and get_cells returns positions in the support.
+    """
+
+    def __init__(self, P_matrix: ndarray, Av: ndarray, Bv: ndarray):
+        self._Av = Av
+        self._Bv = Bv
+        self._m = P_matrix.shape[TwoDimensionalRandomValue._m_axis]
+
+        if issparse(P_matrix):
+            rows, cols, weights = nonzero_cells(P_matrix)
+            self.support = (rows, cols)
+        else:
+            weights = P_matrix.ravel()
+            self.support = None
+
+        self._probs, self._alias = _build_alias_table(weights.astype(float).tobytes())
+
+
+    def get_cells(self, size: int, rng: Optional[Generator] = None) -> ndarray:
+        k = len(self._probs)
+        buckets = (_uniform(size, rng) * k).astype(intp)
+        buckets[buckets >= k] = k - 1
+        return where(_uniform(size, rng) < self._probs[buckets], buckets, self._alias[buckets])
+
+
+    def get_indices(self, size: int, rng: Optional[Generator] = None) -> Tuple[ndarray, ndarray]:
+        cells = self.get_cells(size, rng)
+        if self.support is None:
+            return divmod(cells, self._m)
+        return self.support[0][cells], self.support[1][cells]
+
+
+    def get(self, size: int, rng: Optional[Generator] = None) -> ndarray:
+        rows, cols = self.get_indices(size, rng)
+        return column_stack((self._Av[rows], self._Bv[cols]))
+
+
+class MultiDimensionalRandomValue:
+    """
+    k-dimensional generalization of the two-stage sampler: component d is drawn
+    from its conditional distribution given components 0..d-1 (chain rule), with
+    all conditional CDFs built once and laid out like in CumulativeSampler.
+    """
+
+    def __init__(self, P_tensor: ndarray, values: Sequence[ndarray]):
+        self._values = values
+        self._shape = P_tensor.shape
+
+        """
+        prefix_marginals[d] -- joint distribution of components 0..d.
+        """
+        prefix_marginals = [P_tensor]
+        for _ in range(P_tensor.ndim - 1):
+            prefix_marginals.insert(0, sum(prefix_marginals[0], axis = -1))
+
+        self._cdfs = []
+        for d, M in enumerate(prefix_marginals):
+            C = cumsum(M.reshape(-1, self._shape[d]), axis = 1)
+            C = divide(C, C[:, -1:], out = zeros_like(C, dtype = float), where = C[:, -1:] > 0)
+            C[:, -1] = 1.0
+            self._cdfs.append((C + arange(len(C))[:, None]).ravel())
+
+        self.marginals = [
+          sum(P_tensor, axis = tuple(axis for axis in range(P_tensor.ndim) if axis != d))
+          for d in range(P_tensor.ndim)
+        ]
+
+
+    def get_indices(self, size: int, rng: Optional[Generator] = None) -> ndarray:
+        indices = empty((size, len(self._shape)), dtype = intp)
+        prefix = zeros_like(indices[:, 0])
+
+        for d, n_d in enumerate(self._shape):
+            cells = searchsorted(self._cdfs[d], prefix + _uniform(size, rng), side = 'right')
+            index = cells - prefix * n_d
+            index[index >= n_d] = n_d - 1
+            indices[:, d] = index
+            prefix = prefix * n_d + index
+
+        return indices
+
+
+    def get(self, size: int, rng: Optional[Generator] = None) -> ndarray:
+        indices = self.get_indices(size, rng)
+        return column_stack([values[indices[:, d]] for d, values in enumerate(self._values)])
+
+
+def nonzero_cells(P_matrix) -> Tuple[ndarray, ndarray, ndarray]:
+    """
+    Rows, columns and probabilities of the nonzero cells of a sparse matrix, in the
+    order every sparse-aware part of task_01 enumerates them.
+    """
+    P_coo = coo_matrix(P_matrix)
+    P_coo.sum_duplicates()
+    P_coo.eliminate_zeros()
+    return P_coo.row, P_coo.col, P_coo.data
+
+
+def _uniform(size: int, rng: Optional[Generator]) -> ndarray:
+    """
+    Draws from rng if one is given, otherwise from the global numpy.random state.
+    """
+    return rand(size) if rng is None else rng.random(size)
+
+
+def build_alias_table(weights: ndarray) -> Tuple[ndarray, ndarray]:
+    """
+    Bucket probabilities and aliases of the alias method over the flattened weights,
+    built anew on every call; AliasSampler reuses cached tables instead.
+    """
+    weights = array(weights, dtype = float).ravel()
+    k = len(weights)
+    scaled = (weights * (k / weights.sum())).tolist()
+
+    probs = ones(k)
+    alias = arange(k, dtype = intp)
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+    while small and large:
+        s, l = small.pop(), large.pop()
+        probs[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = (scaled[l] + scaled[s]) - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+
+    """
+    Whatever is left over is 1 up to rounding, so those buckets keep themselves.
+    """
+    return probs, alias
+
+
+@lru_cache(maxsize = 32)
+def _build_alias_table(P_bytes: bytes) -> Tuple[ndarray, ndarray]:
+    probs, alias = build_alias_table(frombuffer(P_bytes, dtype = float))
+    probs.flags.writeable = False
+    alias.flags.writeable = False
+
+    return probs, alias
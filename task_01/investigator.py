@@ -1,28 +1,94 @@
 import math
 from collections import Counter
+from functools import lru_cache
 from typing import Callable
 from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
 from typing import Union
 
-import scipy.stats.mstats as mstats
+from numpy import array
+from numpy import asarray
+from numpy import diag
+from numpy import einsum
+from numpy import isclose
 from numpy import ndarray
+from numpy import outer
 from numpy import shape
+from numpy import sqrt
+from numpy import stack
 from numpy import sum
 from numpy import zeros
+from numpy.random import Generator
+from numpy.random import default_rng
+from scipy.sparse import csr_matrix
+from scipy.sparse import issparse
 from scipy.stats import chi2
 from scipy.stats import t
 
+import task_01.parallel as parallel
+from task_01.brv_supplier import nonzero_cells
+from task_01.accumulators import EmpiricMatrixAccumulator
+from task_01.accumulators import MomentAccumulator
+
+
+_distributions = {'t': t, 'chi2': chi2}
+
+
+@lru_cache(maxsize = None)
+def _quantile(distribution: str, dof: int, probability: float) -> float:
+    return float(_distributions[distribution](dof).ppf(probability))
+
 
 class Investigator:
 
-    def __init__(self, P_matrix: ndarray, Av: ndarray, Bv: ndarray, supplier: Callable):
+    def __init__(self, P_matrix: ndarray, Av: ndarray, Bv: ndarray, supplier: Callable,
+                 sampler = None):
         self._P_matrix = P_matrix
         self._Av = Av
         self._Bv = Bv
         self._supplier = supplier
+        self._sampler = sampler  # batch sampler with get_indices(size), e.g. AliasSampler
+        self._accumulator = None
+        self._support = nonzero_cells(P_matrix)[:2] if issparse(P_matrix) else None
 
 
-    def build_empiric_matrix(self, sample_size: int) -> ndarray:
+    def build_empiric_matrix(self, sample_size: int, extend: bool = False, seed = None,
+                             workers: Optional[int] = None, multinomial: bool = False) -> ndarray:
+        """
+        With a batch sampler, draws are counted in chunks. If extend is set, the
+        previous sample is reused and only the missing draws are made. If seed is
+        set, draws are made reproducibly across a pool of workers.
+
+        If multinomial is set, no pairs are drawn at all: the cell counts come from a
+        single multinomial draw on the flattened P_matrix, in O(cells) for any n.
+        """
+        if self._sampler is not None or multinomial:
+            if not extend or self._accumulator is None \
+                    or self._accumulator.sample_size > sample_size:
+                self._accumulator = EmpiricMatrixAccumulator(self._P_matrix.shape,
+                                                             self._sampler,
+                                                             support = self._support)
+            """
+            An extension is seeded by the root seed and the number of draws already
+            made, so a given sequence of calls always yields the same matrices and
+            every top-up uses its own stream.
+            """
+            drawn = self._accumulator.sample_size
+            if multinomial:
+                rng = default_rng(None if seed is None else [seed, drawn])
+                counts = Investigator.sample_empiric_counts(self._P_matrix, sample_size - drawn,
+                                                            rng = rng)
+                return self._accumulator.add(counts, sample_size - drawn).matrix()
+
+            if seed is None:
+                return self._accumulator.extend_to(sample_size).matrix()
+
+            counts = parallel.count_empiric_matrix(self._sampler, self._P_matrix.shape,
+                                                   sample_size - drawn, [seed, drawn], workers)
+            return self._accumulator.add(counts, sample_size - drawn).matrix()
+
         d_matrix = zeros(shape(self._P_matrix))
         sample = Counter(
           [self._supplier(self._P_matrix, self._Av, self._Bv) for _ in range(sample_size)]
@@ -44,40 +110,160 @@ class Investigator:
 
     @staticmethod
     def D_point_estimation(X, n, M_estimate) -> float:
-        return 1 / (n - 1) * math.fsum(list(map(lambda xi: (xi - M_estimate) ** 2, X)))
+        deviations = asarray(X, dtype = float) - M_estimate
+        return float(deviations @ deviations) / (n - 1)
 
 
     @staticmethod
-    def M_confidence_interval(n, D, M, probability) -> List[Union[float, List[float]]]:
-        arr = t(n).rvs(100000)
+    def moments(X) -> MomentAccumulator:
+        """
+        X -- a sample, or an iterable of sample chunks that need not fit in memory.
+        """
+        if isinstance(X, ndarray):
+            return MomentAccumulator().update(X)
+        return MomentAccumulator().update_from(X)
 
-        delta = mstats.mquantiles(arr, prob = probability) * math.sqrt(D / (n - 1))
-        confidence_interval = [M - delta[0], M + delta[0]]
 
-        return [delta, confidence_interval]
+    @staticmethod
+    def M_confidence_interval(n, D, M, probability) -> List[Union[float, List[float]]]:
+        deltas, intervals = Investigator.M_confidence_intervals(n, D, M, [probability])
+        return [deltas[0], intervals[0].tolist()]
 
 
     @staticmethod
     def D_confidence_interval(n, D, M, probabilities) -> List[Union[float, List[float]]]:
-        arr = chi2(n - 1).rvs(100000)
+        deltas, intervals = Investigator.D_confidence_intervals(n, D, M, [probabilities])
+        return [deltas[0], intervals[0].tolist()]
+
+
+    @staticmethod
+    def M_confidence_intervals(n, D, M, probabilities) -> Tuple[ndarray, ndarray]:
+        """
+        Intervals for every probability level at once, the last axis of the second
+        array is [lower, upper]. Quantiles of t(n) are exact and memoized. D and M may
+        be arrays of estimates (e.g. one per replicate), intervals then get their shape
+        in front.
+        """
+        quantiles = array([_quantile('t', n, float(prob)) for prob in probabilities])
+        D, M = asarray(D, dtype = float)[..., None], asarray(M, dtype = float)[..., None]
+
+        deltas = quantiles * sqrt(D / (n - 1))
+        confidence_intervals = stack((M - deltas, M + deltas), axis = -1)
+
+        return deltas, confidence_intervals
+
+
+    @staticmethod
+    def D_confidence_intervals(n, D, M, probabilities) -> Tuple[ndarray, ndarray]:
+        """
+        probabilities -- pairs [lower, upper] of chi2(n - 1) quantile levels.
+        """
+        quantiles = array([
+          [_quantile('chi2', n - 1, float(prob)) for prob in pair] for pair in probabilities
+        ])
+        D = asarray(D, dtype = float)[..., None]
 
-        delta = mstats.mquantiles(arr, prob = probabilities)
-        confidence_interval = [D - (n - 1) * D / delta[1], D + (n - 1) * D / delta[0]]
+        confidence_intervals = stack((D - (n - 1) * D / quantiles[:, 1],
+                                      D + (n - 1) * D / quantiles[:, 0]), axis = -1)
 
-        return [delta[1], confidence_interval]
+        return quantiles[:, 1], confidence_intervals
 
 
     @staticmethod
     def find_correlation(M_x1, M_x2, D_x1, D_x2, empiric_matrix, A, B):
-        M_x1_x2 = 0
-        for i in range(empiric_matrix.shape[0]):
-            for j in range(empiric_matrix.shape[1]):
-                M_x1_x2 += A[i] * B[j] * empiric_matrix[i, j]
+        M_x1_x2 = A @ (empiric_matrix @ B)
         return (M_x1_x2 - M_x1 * M_x2) / math.sqrt(D_x1) * math.sqrt(D_x2)
 
 
+    @staticmethod
+    def find_covariance_matrix(P_tensor: ndarray, values: Sequence[ndarray],
+                               marginals: Optional[Sequence[ndarray]] = None) -> ndarray:
+        """
+        P_tensor -- k-dimensional joint distribution, values[d] -- values of component d.
+        marginals -- per-component marginals, if they have been computed already
+        (e.g. MultiDimensionalRandomValue.marginals).
+        """
+        k = P_tensor.ndim
+        axes = list(range(k))
+        if marginals is None:
+            marginals = [
+              sum(P_tensor, axis = tuple(axis for axis in axes if axis != d)) for d in axes
+            ]
+
+        centered = [v - marginal @ v for v, marginal in zip(values, marginals)]
+
+        covariance = diag([marginal @ (c * c) for c, marginal in zip(centered, marginals)])
+        for i in axes[:-1]:
+            """
+            P_tensor weighted by the centred values of component i and summed over its
+            axis: one pass over the tensor per row, into a tensor n_i times smaller.
+            """
+            rest = [axis for axis in axes if axis != i]
+            weighted = einsum(P_tensor, axes, centered[i], [i], rest)
+            for j in range(i + 1, k):
+                covariance[i, j] = covariance[j, i] = \
+                    einsum(weighted, rest, centered[j], [j], [])
+
+        return covariance
+
+
+    @staticmethod
+    def find_correlation_matrix(P_tensor: ndarray, values: Sequence[ndarray],
+                                marginals: Optional[Sequence[ndarray]] = None) -> ndarray:
+        covariance = Investigator.find_covariance_matrix(P_tensor, values, marginals)
+        deviations = sqrt(diag(covariance))
+        return covariance / outer(deviations, deviations)
+
+
+    @staticmethod
+    def sample_empiric_counts(P_matrix: ndarray, n: int, replicates: Optional[int] = None,
+                              rng: Optional[Generator] = None) -> ndarray:
+        """
+        Cell counts of n draws from P_matrix, shaped like P_matrix, or stacked along a
+        leading axis if replicates is set. For a sparse P_matrix the counts are per
+        nonzero cell, in nonzero_cells order.
+        """
+        rng = default_rng() if rng is None else rng
+        P_flat = nonzero_cells(P_matrix)[2] if issparse(P_matrix) else P_matrix.ravel()
+        counts = rng.multinomial(n, P_flat / P_flat.sum(), size = replicates)
+        if issparse(P_matrix):
+            return counts
+        return counts.reshape(counts.shape[:-1] + P_matrix.shape)
+
+
     @staticmethod
     def pearson_criterion(theoretical_matrix, empiric_matrix, n):
-        chi2_ = n * sum((empiric_matrix - theoretical_matrix) ** 2 / theoretical_matrix)
-        chi2_value = chi2.ppf(0.95, theoretical_matrix.size - 1)
+        if issparse(theoretical_matrix):
+            return Investigator._sparse_pearson_criterion(theoretical_matrix, empiric_matrix, n)
+        return Investigator.pearson_criterion_batch(theoretical_matrix, empiric_matrix[None], n)[0]
+
+
+    @staticmethod
+    def pearson_criterion_batch(theoretical_matrix, empiric_matrices, n,
+                                probability: float = 0.95) -> ndarray:
+        """
+        empiric_matrices -- R empiric (frequency) matrices stacked along the first axis.
+        Returns R answers to whether the data do not contradict theoretical_matrix.
+        """
+        cell_axes = tuple(range(1, empiric_matrices.ndim))
+        chi2_ = n * sum((empiric_matrices - theoretical_matrix) ** 2 / theoretical_matrix,
+                        axis = cell_axes)
+        chi2_value = _quantile('chi2', theoretical_matrix.size - 1, probability)
+        return chi2_ < chi2_value
+
+
+    @staticmethod
+    def _sparse_pearson_criterion(theoretical_matrix, empiric_matrix, n,
+                                  probability: float = 0.95) -> bool:
+        """
+        Only the nonzero cells of theoretical_matrix are scanned. Any empiric mass
+        outside of them contradicts it outright.
+        """
+        rows, cols, P_flat = nonzero_cells(theoretical_matrix)
+        E_flat = asarray(csr_matrix(empiric_matrix)[rows, cols]).ravel()
+        if not isclose(E_flat.sum(), empiric_matrix.sum()):
+            return False
+
+        chi2_ = n * sum((E_flat - P_flat) ** 2 / P_flat)
+        chi2_value = _quantile('chi2', len(P_flat) - 1, probability)
         return chi2_ < chi2_value
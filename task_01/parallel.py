@@ -0,0 +1,80 @@
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from numpy import bincount
+from numpy import concatenate
+from numpy import int64
+from numpy import ndarray
+from numpy import zeros
+from numpy.random import SeedSequence
+from numpy.random import default_rng
+
+from common.pools import process_pool
+
+
+"""
+Work is cut into blocks of a fixed size and block i always draws from the i-th
+child of the root SeedSequence. Which process runs a block does not matter, so
+results are bit-identical for a given seed whatever the worker count.
+"""
+_block_size = 1 << 20
+
+_sampler = None  # per-process sampler, set by the pool initializer
+
+
+def count_empiric_matrix(sampler, shape: Tuple[int, int], sample_size: int, seed,
+                         workers: Optional[int] = None,
+                         block_size: int = _block_size) -> ndarray:
+    """
+    For a sparse sampler (one with a support) the counts are per support cell.
+    """
+    support = getattr(sampler, 'support', None)
+    tasks = [(shape, size, seq) for size, seq in _blocks(sample_size, seed, block_size)]
+    counts = zeros(shape if support is None else len(support[0]), dtype = int64)
+    for block_counts in _map(_count_block, tasks, sampler, workers):
+        counts += block_counts
+    return counts
+
+
+def draw_sample(sampler, sample_size: int, seed, workers: Optional[int] = None,
+                block_size: int = _block_size) -> ndarray:
+    tasks = [(size, seq) for size, seq in _blocks(sample_size, seed, block_size)]
+    if not tasks:
+        return sampler.get(0)  # empty, of the (0, dimensions) shape of a sample
+    return concatenate(list(_map(_draw_block, tasks, sampler, workers)))
+
+
+def _blocks(sample_size: int, seed, block_size: int) -> List[Tuple[int, SeedSequence]]:
+    blocks_no = -(-sample_size // block_size)
+    seqs = SeedSequence(seed).spawn(blocks_no)
+    return [(min(block_size, sample_size - i * block_size), seq) for i, seq in enumerate(seqs)]
+
+
+def _map(func, tasks, sampler, workers: Optional[int]):
+    if workers == 1 or len(tasks) <= 1:
+        _init_worker(sampler)
+        return map(func, tasks)
+
+    with process_pool(workers, _init_worker, (sampler,)) as executor:
+        return list(executor.map(func, tasks))
+
+
+def _init_worker(sampler) -> None:
+    global _sampler
+    _sampler = sampler
+
+
+def _count_block(task) -> ndarray:
+    (n, m), size, seq = task
+    support = getattr(_sampler, 'support', None)
+    if support is not None:
+        return bincount(_sampler.get_cells(size, default_rng(seq)), minlength = len(support[0]))
+
+    rows, cols = _sampler.get_indices(size, default_rng(seq))
+    return bincount(rows * m + cols, minlength = n * m).reshape(n, m)
+
+
+def _draw_block(task) -> ndarray:
+    size, seq = task
+    return _sampler.get(size, default_rng(seq))
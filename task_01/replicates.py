@@ -0,0 +1,70 @@
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+
+from numpy import ndarray
+from numpy import sum
+from numpy import zeros
+from numpy.random import Generator
+
+from task_01.brv_supplier import AliasSampler
+from task_01.investigator import Investigator
+
+
+class CoverageReport(NamedTuple):
+    """
+    Rows are the components x1, x2; columns are the confidence levels.
+    """
+    replicates: int
+    M_coverage: ndarray  # share of replicates whose M interval covers the true mean
+    M_width: ndarray  # average M interval width
+    D_coverage: ndarray
+    D_width: ndarray
+
+
+def coverage_study(P_matrix: ndarray, Av: ndarray, Bv: ndarray, n: int, replicates: int,
+                   probabilities_for_M_int: Sequence[float],
+                   probabilities_for_D_int: Sequence[Sequence[float]],
+                   rng: Optional[Generator] = None, sampler = None,
+                   chunk_size: int = 10000000) -> CoverageReport:
+    """
+    Reruns the task_01 estimation R = replicates times at once: samples are drawn as a
+    (replicates, n) array, chunked over replicates so that at most chunk_size pairs
+    are held in memory, and intervals are built with axis-wise reductions.
+    """
+    if sampler is None:
+        sampler = AliasSampler(P_matrix, Av, Bv)
+
+    values = (Av.astype(float), Bv.astype(float))
+    marginals = (sum(P_matrix, axis = 1), sum(P_matrix, axis = 0))
+    M_true = [marginal @ v for marginal, v in zip(marginals, values)]
+    D_true = [marginal @ (v - M) ** 2 for marginal, v, M in zip(marginals, values, M_true)]
+
+    M_levels, D_levels = len(probabilities_for_M_int), len(probabilities_for_D_int)
+    M_covered, M_width = zeros((2, M_levels)), zeros((2, M_levels))
+    D_covered, D_width = zeros((2, D_levels)), zeros((2, D_levels))
+
+    chunk_replicates = max(chunk_size // n, 1)
+    for start in range(0, replicates, chunk_replicates):
+        r = min(chunk_replicates, replicates - start)
+        indices = sampler.get_indices(r * n, rng)
+
+        for no, (index, v) in enumerate(zip(indices, values)):
+            X = v[index].reshape(r, n)
+            M = X.mean(axis = 1)
+            D = X.var(axis = 1, ddof = 1)
+
+            _, intervals = Investigator.M_confidence_intervals(n, D, M, probabilities_for_M_int)
+            M_covered[no] += _covered(intervals, M_true[no])
+            M_width[no] += sum(intervals[..., 1] - intervals[..., 0], axis = 0)
+
+            _, intervals = Investigator.D_confidence_intervals(n, D, M, probabilities_for_D_int)
+            D_covered[no] += _covered(intervals, D_true[no])
+            D_width[no] += sum(intervals[..., 1] - intervals[..., 0], axis = 0)
+
+    return CoverageReport(replicates, M_covered / replicates, M_width / replicates,
+                          D_covered / replicates, D_width / replicates)
+
+
+def _covered(intervals: ndarray, value: float) -> ndarray:
+    return sum((intervals[..., 0] <= value) & (value <= intervals[..., 1]), axis = 0)
@@ -1,7 +1,11 @@
+import argparse
+
+import matplotlib.pyplot as plt
 import simpy
 from numpy import add
 from numpy import array
 
+from task_02.profiling import Profiler
 from task_02.qsm import QSM
 from task_02.util import draw_probabilities_histograms
 from task_02.util import draw_probabilities_of_amount_of_requests_in_system_histograms
@@ -10,6 +14,12 @@ from task_02.util import log_given
 from task_02.util import log_probabilities
 
 
+parser = argparse.ArgumentParser(description = 'Simulates M/M/n/m QSM with impatience.')
+parser.add_argument('--profile', action = 'store_true', help = 'report counters and timings')
+parser.add_argument('--cprofile', action = 'store_true', help = 'also run cProfile on the run')
+args = parser.parse_args()
+profiler = Profiler(args.profile or args.cprofile, args.cprofile)
+
 # channels_no = 2
 # max_queue_sz = 10
 # requests_rt = 10
@@ -32,10 +42,14 @@ env = simpy.Environment()
 model = QSM(env, channels_no, max_queue_sz, requests_rt, service_rt, v_param)
 
 env.process(QSM.run(env, model))
-env.run(until = 4000)
+with profiler.stage('simulation'):
+    env.run(until = 4000)
+profiler.record_run(model)
 
-empiric_results = model.stats.find_empiric_probs()
-theoretic_results = model.stats.find_theoretical_probs()
+with profiler.stage('find_empiric_probs'):
+    empiric_results = model.stats.find_empiric_probs()
+with profiler.stage('find_theoretical_probs'):
+    theoretic_results = model.stats.find_theoretical_probs()
 P_emp = empiric_results[0]
 P_theor = theoretic_results[0]
 
@@ -53,7 +67,15 @@ log_probabilities(P_emp, P_theor)
 
 log_average_values_comparison(*values_to_compare)
 
-draw_probabilities_histograms(array(P_emp), array(P_theor))
+"""
+The stage only builds the figures: plt.show() blocks until they are closed, so it is
+left out of the timings.
+"""
+with profiler.stage('plotting'):
+    draw_probabilities_histograms(array(P_emp), array(P_theor))
+
+    draw_probabilities_of_amount_of_requests_in_system_histograms(requests_in_system_at_time,
+                                                                  P_theor)
 
-draw_probabilities_of_amount_of_requests_in_system_histograms(requests_in_system_at_time,
-                                                              P_theor)
+profiler.report()
+plt.show()
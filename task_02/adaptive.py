@@ -0,0 +1,179 @@
+import math
+from typing import Dict
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from numpy import arange
+from numpy import array
+from numpy import cumsum
+from numpy import isfinite
+from numpy import nan
+from numpy import ndarray
+from numpy import sqrt
+from scipy.stats import t
+
+from task_02.statistics import Statistics
+from task_02.statistics import StatisticsMark
+from task_02.statistics import ratio_variance
+from task_02.statistics import value_names
+
+
+class AdaptiveRun(NamedTuple):
+    #
+    stats: Statistics  # statistics of the run after the warm-up
+    warmup: float  # simulated time discarded as warm-up
+    until: float  # simulated time the run was stopped at
+    means: Dict[str, float]  # batch-means estimate of every metric after the warm-up
+    half_widths: Dict[str, float]  # confidence half-width of every metric
+
+
+def run_adaptive(model, metrics: Sequence[str] = ('P_rejected', 'avg_req_time_in_system'),
+                 tolerance: float = 0.01, relative: bool = False, probability: float = 0.95,
+                 batch_len: Optional[float] = None, min_batches: int = 20,
+                 max_until: float = 1e5) -> AdaptiveRun:
+    """
+    Simulates a QSM or HeapQSM model (with list-based Statistics, its arrival process
+    already started) in time batches until the batch-means confidence half-width of
+    every one of metrics (names from value_names) is at most tolerance (times the
+    estimate if relative), or until max_until.
+
+    Every batch is 5 * stats.time_batch_len long unless batch_len is given. Each metric
+    is a ratio of sums over the kept batches (e.g. time in system over finished
+    requests), so batches without any request count with zero weight. The warm-up is
+    found with MSER-5 over the batch values of each metric, empty batches folded into
+    the following ones; the latest truncation point wins, the batches before it are
+    discarded, and at least min_batches must remain after it.
+    """
+    stats = model.stats
+    if type(stats) is not Statistics:
+        raise TypeError('Adaptive runs need the per-request lists of Statistics')
+    if set(metrics) - set(value_names):
+        raise ValueError(f'Unknown metrics: {set(metrics) - set(value_names)}')
+    if batch_len is None:
+        batch_len = 5 * stats.time_batch_len
+
+    marks = [_mark(model)]
+    sums = {name: [] for name in metrics}  # (numerator, denominator) of every batch
+
+    while True:
+        until = min(marks[-1].now + batch_len, max_until)
+        _advance(model, until)
+        marks.append(_mark(model))
+
+        batch = _batch_sums(stats, marks[-2], marks[-1])
+        for name in metrics:
+            sums[name].append(batch[name])
+
+        warmup_batches = max(_warmup_batches(array(values)) for values in sums.values())
+        kept = {name: array(values[warmup_batches:]).T for name, values in sums.items()}
+        batches_no = len(marks) - 1 - warmup_batches
+
+        means = {name: _ratio(*values) for name, values in kept.items()}
+        if batches_no > 1:
+            quantile = _t_quantile(batches_no, probability)
+            half_widths = {name: quantile * sqrt(ratio_variance(*values))
+                           if values[1].sum() else nan for name, values in kept.items()}
+        else:
+            half_widths = {name: nan for name in kept}
+
+        precise = all(
+          half_widths[name] <= tolerance * (abs(means[name]) if relative else 1)
+          for name in metrics
+        )
+        if (batches_no >= min_batches and precise) or until >= max_until:
+            break
+
+    start = marks[warmup_batches]
+    return AdaptiveRun(stats.truncated(start), start.now - marks[0].now, until, means,
+                       half_widths)
+
+
+def mser_truncation(series: ndarray) -> int:
+    """
+    MSER: the truncation point d minimizing the squared standard error of the mean
+    of series[d:], searched over the first half of the series. Values that are not
+    finite (batches without requests) make the point undefined, 0 is returned then.
+    """
+    n = len(series)
+    if n < 2 or not isfinite(series).all():
+        return 0
+
+    """
+    Tail sums of x and x^2, so that every candidate d costs O(1).
+    """
+    tail_sum = cumsum(series[::-1])[::-1]
+    tail_sq_sum = cumsum(series[::-1] ** 2)[::-1]
+    d = arange(n // 2 + 1)
+    kept = n - d
+    squared_deviations = tail_sq_sum[d] - tail_sum[d] ** 2 / kept
+    return int((squared_deviations / kept ** 2).argmin())
+
+
+def _advance(model, until: float) -> None:
+    if hasattr(model, 'env'):
+        model.env.run(until = until)
+    else:
+        model.run(until)
+
+
+def _mark(model) -> StatisticsMark:
+    return model.stats.mark(model.env.now if hasattr(model, 'env') else model.now)
+
+
+def _batch_sums(stats: Statistics, start: StatisticsMark, end: StatisticsMark) \
+        -> Dict[str, Tuple[float, float]]:
+    """
+    The find_empiric_probs values of one batch as (numerator, denominator) sums over
+    its records; the denominator is 0 for a batch without such records.
+    """
+    awaiting = sum(stats.requests_awaiting[start.arrivals:end.arrivals])
+    processing = sum(stats.requests_processing[start.arrivals:end.arrivals])
+    arrivals = end.arrivals - start.arrivals
+    time_awaiting = sum(stats.time_spent_awaiting[start.awaited:end.awaited])
+    time_total = sum(stats.time_spent_total[start.finished:end.finished])
+    left = end.completed - start.completed + end.rejected - start.rejected
+    rejected = end.rejected - start.rejected
+
+    return {
+      'Q': (left - rejected, left),
+      'A': ((left - rejected) * stats.model.requests_rt, left),
+      'P_rejected': (rejected, left),
+      'avg_req_in_system': (awaiting + processing, arrivals),
+      'avg_req_in_queue': (awaiting, arrivals),
+      'avg_req_time_in_system': (time_total, end.finished - start.finished),
+      'avg_req_time_in_queue': (time_awaiting, end.awaited - start.awaited),
+      'avg_req_processed': (processing, arrivals),
+    }
+
+
+def _warmup_batches(sums: ndarray) -> int:
+    """
+    MSER truncation point over the batches of (numerator, denominator) sums. A batch
+    with zero denominator has no value of its own and is folded into the next batches
+    up to the first one that has; trailing empty batches join the last value.
+    """
+    starts, values = [], []
+    group_start, numerator, denominator = 0, 0.0, 0.0
+    for i, (y, x) in enumerate(sums):
+        numerator, denominator = numerator + y, denominator + x
+        if denominator:
+            starts.append(group_start)
+            values.append(numerator / denominator)
+            group_start, numerator, denominator = i + 1, 0.0, 0.0
+
+    if not values:
+        return 0
+    return starts[mser_truncation(array(values))]
+
+
+def _ratio(numerators: ndarray, denominators: ndarray) -> float:
+    """
+    nan while there are no records.
+    """
+    return numerators.sum() / denominators.sum() if denominators.sum() else nan
+
+
+def _t_quantile(batches_no: int, probability: float) -> float:
+    return t(batches_no - 1).ppf((1 + probability) / 2)
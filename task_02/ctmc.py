@@ -0,0 +1,277 @@
+import math
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from numpy import arange
+from numpy import array
+from numpy import asarray
+from numpy import diff
+from numpy import maximum
+from numpy import minimum
+from numpy import nan
+from numpy import ndarray
+from numpy.random import Generator
+from numpy.random import default_rng
+
+from task_02.statistics import Statistics
+from task_02.statistics import ratio_variance
+
+
+_block_size = 1 << 16  # random variates drawn per refill
+
+
+class CTMCQSM:
+    """
+    Every delay in QSM is exponential, so the model is a birth-death Markov chain whose
+    state is the number of requests in the system. This engine simulates the jumps of
+    that chain directly (Gillespie): one exponential holding time and one
+    competing-rates draw per event, no per-request objects.
+
+        model = CTMCQSM(channels_no, max_queue_sz, requests_rt, service_rt, v_param)
+        model.run(until = 4000)
+        model.stats.find_empiric_probs()
+    """
+
+    def __init__(self
+                 , channels_no: int
+                 , max_queue_sz: int
+                 , requests_rt: float
+                 , service_rt: float
+                 , v_param: float
+                 , rng: Optional[Generator] = None):
+        self.channels_no = channels_no
+        self.max_queue_sz = max_queue_sz
+        self.requests_rt = requests_rt
+        self.service_rt = service_rt
+        self.v_param = v_param
+        self.stats = CTMCStatistics(self)
+
+        self.now = 0.0
+        self.state = 0  # requests in the system
+        self.events_amount = 0
+        self._rng = default_rng() if rng is None else rng
+        self._capacity = channels_no + max_queue_sz  # may be inf
+        self._tables = self._build_tables(
+          int(self._capacity) + 1 if self._capacity != math.inf else 64
+        )
+
+
+    def _build_tables(self, size: int) -> Tuple[List[float], List[float], List[float]]:
+        """
+        Per state k: mean holding time, P(arrival), P(arrival or service completion).
+        """
+        k = arange(size, dtype = float)
+        busy = minimum(k, self.channels_no)
+        queued = maximum(k - self.channels_no, 0)
+
+        arrival = array([self.requests_rt] * size)
+        service = busy * self.service_rt
+        abandonment = queued * self.v_param if self.max_queue_sz != math.inf else queued * 0
+        total = arrival + service + abandonment
+
+        self.stats.ensure_states(size)
+        return (
+          (1.0 / total).tolist(),
+          (arrival / total).tolist(),
+          ((arrival + service) / total).tolist(),
+        )
+
+
+    def run(self, until: float) -> None:
+        """
+        May be called repeatedly with a growing until to continue the same run: the
+        jump that would cross until is dropped, which is exact for a Markov chain.
+        """
+        stats = self.stats
+        seen, time_in_state = stats.arrivals_seen, stats.time_in_state
+        holding, p_arrival, p_up_or_service = self._tables
+        capacity, size = self._capacity, len(holding)
+        k, now, events = self.state, self.now, 0
+        completed = rejected = 0
+
+        while now < until:
+            exps = self._rng.standard_exponential(_block_size).tolist()
+            uniforms = self._rng.random(_block_size).tolist()
+
+            for e, u in zip(exps, uniforms):
+                dt = e * holding[k]
+                if now + dt >= until:
+                    time_in_state[k] += until - now
+                    now = until
+                    break
+
+                now += dt
+                time_in_state[k] += dt
+                events += 1
+
+                if u < p_arrival[k]:
+                    seen[k] += 1
+                    if k < capacity:
+                        k += 1
+                        if k == size - 1 and capacity == math.inf:
+                            self._tables = self._build_tables(2 * size)
+                            holding, p_arrival, p_up_or_service = self._tables
+                            seen, time_in_state = stats.arrivals_seen, stats.time_in_state
+                            size = len(holding)
+                    else:
+                        rejected += 1
+                elif u < p_up_or_service[k]:
+                    completed += 1
+                    k -= 1
+                else:
+                    rejected += 1  # abandoned the queue
+                    k -= 1
+            else:
+                stats.record_block()
+
+        self.state, self.now = k, now
+        self.events_amount += events
+        stats.requests_completed_amount += completed
+        stats.requests_rejected_amount += rejected
+
+
+class CTMCStatistics(Statistics):
+    """
+    Statistics of a CTMCQSM run. Instead of per-request lists it keeps, per state,
+    how many arrivals found the system in it and how long the system stayed in it.
+    Times spent by requests are recovered with Little's law.
+
+    Variances are batch means over the stretches of the run between full blocks of
+    random variates drawn by the engine, at least _block_size events each.
+    """
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.arrivals_seen = []  # arrivals_seen[k] -- arrivals that found k requests
+        self.time_in_state = []  # time_in_state[k] -- time spent with k requests
+        """
+        Running totals at the end of every full block: arrivals and the sums of requests
+        in the system and processing they found, time and the areas under the same two.
+        """
+        self._blocks = []
+
+
+    def ensure_states(self, size: int) -> None:
+        self.arrivals_seen.extend([0] * (size - len(self.arrivals_seen)))
+        self.time_in_state.extend([0.0] * (size - len(self.time_in_state)))
+
+
+    def get_amounts_of_requests_in_system_histogram(self, states_no: int) -> ndarray:
+        histogram = array(self.arrivals_seen, dtype = int)
+        histogram.resize(max(states_no, len(histogram)))
+        return histogram
+
+
+    def record_block(self) -> None:
+        seen = array(self.arrivals_seen, dtype = float)
+        time_in_state = array(self.time_in_state)
+        k = arange(len(seen))
+        busy = minimum(k, self.model.channels_no)
+        self._blocks.append((seen.sum(), seen @ k, seen @ busy,
+                             time_in_state.sum(), time_in_state @ k, time_in_state @ busy))
+
+
+    def _find_batch_variances(self, arrival_instant: bool) -> Tuple[float, float, float]:
+        """
+        Variances of the ratio estimators (sum / arrivals or area / time) of the
+        averages in the system, in the queue and processing.
+        """
+        if len(self._blocks) < 2:
+            return nan, nan, nan
+
+        totals = diff(array([(0.0,) * 6] + self._blocks), axis = 0)
+        weights, in_system, processed = totals.T[:3] if arrival_instant else totals.T[3:]
+        in_queue = in_system - processed
+
+        var_in_system, var_in_queue, var_processed = (
+          ratio_variance(values, weights) for values in (in_system, in_queue, processed)
+        )
+        return var_in_system, var_in_queue, var_processed
+
+
+    def find_empiric_probs(self, time_weighted: bool = False) -> Tuple:
+        capacity = self.model.channels_no + self.model.max_queue_sz
+        seen = array(self.arrivals_seen, dtype = float)
+        max_state = int(capacity) if capacity != math.inf \
+            else int(arange(len(seen))[seen > 0].max(initial = 0))
+
+        (P, Q, A, P_rejected, avg_req_in_system, avg_req_in_queue, avg_req_time_in_system,
+         avg_req_time_in_queue, avg_req_processed) = \
+            empiric_probs_from_counters(self.model, seen, array(self.time_in_state),
+                                        self.requests_completed_amount,
+                                        self.requests_rejected_amount, max_state)
+
+        if time_weighted:
+            (P_time, avg_req_in_system, avg_req_in_queue, avg_req_processed, _) = \
+                self.find_time_weighted_probs()
+            P = P_time[1:max_state + 1]
+
+        return (P, Q, A, P_rejected, avg_req_in_system, avg_req_in_queue, avg_req_time_in_system,
+                avg_req_time_in_queue, avg_req_processed)
+
+
+    def find_time_weighted_probs(self, until: Optional[float] = None) -> Tuple:
+        """
+        Same layout as Statistics.find_time_weighted_probs. Time in state is integrated
+        by the engine itself, so until is ignored.
+        """
+        time_in_state = array(self.time_in_state)
+        P = time_in_state / time_in_state.sum()
+        k = arange(len(P))
+        busy = minimum(k, self.model.channels_no)
+
+        return (P.tolist(), P @ k, P @ (k - busy), P @ busy,
+                self._find_batch_variances(arrival_instant = False))
+
+
+    def find_arrival_instant_probs(self) -> Tuple:
+        seen = array(self.arrivals_seen, dtype = float)
+        P = seen / seen.sum()
+        k = arange(len(P))
+        busy = minimum(k, self.model.channels_no)
+
+        return (P.tolist(), P @ k, P @ (k - busy), P @ busy,
+                self._find_batch_variances(arrival_instant = True))
+
+
+def empiric_probs_from_counters(model, seen, time_in_state, completed, rejected,
+                                max_state: int) -> Tuple:
+    """
+    The find_empiric_probs tuple computed from per-state counters. seen and
+    time_in_state may carry leading (e.g. replica) axes in front of the state axis,
+    completed and rejected then are arrays of that leading shape, and so is every
+    value of the result.
+    """
+    requests_passed_total = completed + rejected
+
+    k = arange(seen.shape[-1])
+    busy = minimum(k, model.channels_no)
+    queued = k - busy
+
+    """
+    P -- array of probabilities, laid out like in Statistics.find_empiric_probs.
+    """
+    P = seen[..., 1:max_state + 1] / asarray(requests_passed_total)[..., None]
+
+    P_rejected = rejected / requests_passed_total
+    Q = 1 - P_rejected
+    A = Q * model.requests_rt
+
+    arrivals = seen.sum(axis = -1)
+    avg_req_in_system = seen @ k / arrivals
+    avg_req_processed = seen @ busy / arrivals
+    avg_req_in_queue = seen @ queued / arrivals
+
+    """
+    Little's law: time-average number of requests (in the system, in the queue) is
+    the rate of admitted requests times the average time they spend there. Requests
+    refused on arrival are the arrivals that found the system full.
+    """
+    refused = seen[..., max_state] if model.channels_no + model.max_queue_sz != math.inf else 0
+    admitted = arrivals - refused
+    avg_req_time_in_system = time_in_state @ k / admitted
+    avg_req_time_in_queue = time_in_state @ queued / admitted
+
+    return (P.tolist() if P.ndim == 1 else P, Q, A, P_rejected, avg_req_in_system,
+            avg_req_in_queue, avg_req_time_in_system, avg_req_time_in_queue, avg_req_processed)
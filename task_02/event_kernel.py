@@ -0,0 +1,142 @@
+import math
+from collections import deque
+from heapq import heappop
+from heapq import heappush
+from typing import Optional
+
+from numpy.random import Generator
+
+from task_02.statistics import Statistics
+from task_02.statistics import StreamingStatistics
+from task_02.variates import Distribution
+from task_02.variates import VariateStreams
+
+
+_ARRIVAL = 0
+_DEPARTURE = 1
+_IMPATIENCE = 2
+
+
+class _Request:
+    #
+    __slots__ = ('arrival_tstamp', 'served', 'abandoned')
+
+
+    def __init__(self, arrival_tstamp: float):
+        self.arrival_tstamp = arrival_tstamp
+        self.served = False
+        self.abandoned = False
+
+
+class HeapQSM:
+    """
+    The same model as QSM, simulated on a plain heapq event queue instead of one simpy
+    process per request. Events are (time, seq, kind, request) tuples; impatience
+    timeouts are never removed from the heap, they are dropped when they fire for a
+    request that has already been served. Statistics are collected exactly like in QSM.
+
+        model = HeapQSM(channels_no, max_queue_sz, requests_rt, service_rt, v_param)
+        model.run(until = 4000)
+        model.stats.find_empiric_probs()
+    """
+
+    def __init__(self
+                 , channels_no: int
+                 , max_queue_sz: int
+                 , requests_rt: float
+                 , service_rt: float
+                 , v_param: float
+                 , streaming: bool = False
+                 , rng: Optional[Generator] = None
+                 , service: Optional[Distribution] = None
+                 , patience: Optional[Distribution] = None):
+        self.channels_no = channels_no
+        self.max_queue_sz = max_queue_sz
+        self.requests_rt = requests_rt
+        self.service_rt = service_rt
+        self.v_param = v_param
+        self.stats = StreamingStatistics(self) if streaming else Statistics(self)
+        self.variates = VariateStreams(requests_rt, service_rt, v_param, rng, service, patience)
+
+        self.now = 0.0
+        self._events = []
+        self._seq = 0
+        self._queue = deque()
+        self._queue_length = 0  # queued requests that have not abandoned
+        self._busy = 0
+
+        self._schedule(self.variates.arrivals.next(), _ARRIVAL, None)
+
+
+    def _schedule(self, time: float, kind: int, request) -> None:
+        heappush(self._events, (time, self._seq, kind, request))
+        self._seq += 1
+
+
+    def run(self, until: float) -> None:
+        """
+        May be called repeatedly with a growing until to continue the same run.
+        """
+        events = self._events
+        while events and events[0][0] < until:
+            self.now, _, kind, request = heappop(events)
+            if kind == _ARRIVAL:
+                self._arrive()
+            elif kind == _DEPARTURE:
+                self._depart(request)
+            elif not request.served:
+                self._abandon(request)
+        self.now = until
+
+
+    def _arrive(self) -> None:
+        stats = self.stats
+        stats.record_arrival(self._queue_length, self._busy)  # stats
+
+        self._schedule(self.now + self.variates.arrivals.next(), _ARRIVAL, None)
+
+        request = _Request(self.now)
+        if self._busy < self.channels_no:
+            self._start_processing(request)
+        elif self.max_queue_sz == math.inf:
+            self._queue.append(request)
+            self._queue_length += 1
+        elif self._queue_length < self.max_queue_sz:
+            self._queue.append(request)
+            self._queue_length += 1
+            self._schedule(self.now + self.variates.patience.next(), _IMPATIENCE, request)
+        else:
+            stats.requests_rejected_amount += 1  # stats
+        stats.observe_state(self.now, self._queue_length, self._busy)  # stats
+
+
+    def _start_processing(self, request: _Request) -> None:
+        request.served = True
+        self._busy += 1
+        self.stats.record_time_awaiting(self.now - request.arrival_tstamp)  # stats
+        self._schedule(self.now + self.variates.service.next(), _DEPARTURE, request)
+
+
+    def _depart(self, request: _Request) -> None:
+        self._busy -= 1
+        self.stats.requests_completed_amount += 1  # stats
+        self.stats.record_time_total(self.now - request.arrival_tstamp)  # stats
+
+        queue = self._queue
+        while queue:
+            waiting = queue.popleft()
+            if waiting.abandoned:
+                continue  # lazily removed
+            self._queue_length -= 1
+            self._start_processing(waiting)
+            break
+        self.stats.observe_state(self.now, self._queue_length, self._busy)  # stats
+
+
+    def _abandon(self, request: _Request) -> None:
+        request.abandoned = True
+        self._queue_length -= 1
+        self.stats.requests_rejected_amount += 1  # stats
+        self.stats.record_time_awaiting(self.now - request.arrival_tstamp)  # stats
+        self.stats.record_time_total(self.now - request.arrival_tstamp)  # stats
+        self.stats.observe_state(self.now, self._queue_length, self._busy)  # stats
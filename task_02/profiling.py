@@ -0,0 +1,119 @@
+import cProfile
+import io
+import math
+import pstats
+import time
+from contextlib import contextmanager
+from typing import Dict
+from typing import Optional
+
+import prettytable as tbl
+
+from task_02.util import sep
+
+
+class Profiler:
+    """
+    Wall time per stage of a script and counters of a finished run. Counters are
+    derived from the model's statistics after the run, so the simulation itself is not
+    instrumented; a disabled profiler only enters empty with blocks.
+
+        profiler = Profiler(enabled = True, cprofile = True)
+        with profiler.stage('simulation'):
+            env.run(until = 4000)
+        profiler.record_run(model)
+        profiler.report()
+
+    cprofile -- run the 'simulation' stages under cProfile and print the top functions.
+    """
+
+    simulation_stage = 'simulation'
+
+    def __init__(self, enabled: bool = False, cprofile: bool = False, top: int = 20):
+        self.enabled = enabled
+        self.top = top
+        self.stages: Dict[str, float] = {}  # stage -> wall time spent in it
+        self.runs = []  # counters of every recorded run
+        self._cprofile = cProfile.Profile() if enabled and cprofile else None
+
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        profile = self._cprofile if name == self.simulation_stage else None
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+    def record_run(self, model, sim_time: Optional[float] = None) -> None:
+        """
+        Counts of the run of model, to be called right after its simulation stage.
+        Refusals are the arrivals that found the system full, abandonments the other
+        rejections. Events are arrivals plus departures of any kind.
+        """
+        if not self.enabled:
+            return
+        if sim_time is None:
+            sim_time = model.env.now if hasattr(model, 'env') else model.now
+
+        stats = model.stats
+        capacity = model.channels_no + model.max_queue_sz
+        histogram = stats.get_amounts_of_requests_in_system_histogram(
+          int(capacity) + 1 if capacity != math.inf else 0
+        )
+        arrivals = int(histogram.sum())
+        refusals = int(histogram[int(capacity)]) if capacity != math.inf else 0
+        rejections = stats.requests_rejected_amount
+        abandonments = rejections - refusals
+        completions = stats.requests_completed_amount
+        events = arrivals + abandonments + completions
+        wall_time = self.stages.get(self.simulation_stage, 0.0) - sum(
+          run['wall_time'] for run in self.runs
+        )
+
+        self.runs.append({
+          'arrivals': arrivals,
+          'rejections': rejections,
+          'refusals': refusals,
+          'abandonments': abandonments,
+          'completions': completions,
+          'sim_time': sim_time,
+          'wall_time': wall_time,
+          'sim_to_wall': sim_time / wall_time if wall_time else math.nan,
+          'events_per_second': events / wall_time if wall_time else math.nan,
+        })
+
+
+    def report(self) -> None:
+        if not self.enabled:
+            return
+
+        print(sep)
+        print('Profile:')
+        stages = tbl.PrettyTable(['Stage', 'Wall time, s', 'Share'])
+        total = sum(self.stages.values())
+        for name, spent in self.stages.items():
+            stages.add_row([name, round(spent, 4), f'{spent / total:.1%}' if total else '-'])
+        print(stages)
+
+        if self.runs:
+            runs = tbl.PrettyTable(['Run', *self.runs[0]])
+            for i, run in enumerate(self.runs):
+                runs.add_row([i, *(round(value, 4) for value in run.values())])
+            print(runs)
+
+        if self._cprofile is not None:
+            stream = io.StringIO()
+            pstats.Stats(self._cprofile, stream = stream).sort_stats('cumulative') \
+                .print_stats(self.top)
+            print(stream.getvalue())
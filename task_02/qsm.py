@@ -1,10 +1,28 @@
 import math
+from typing import NamedTuple
+from typing import Optional
 
-from numpy.random import exponential
+from numpy.random import Generator
 from simpy import Environment
 from simpy.resources.resource import Resource
 
 from task_02.statistics import Statistics
+from task_02.statistics import StreamingStatistics
+from task_02.trace import ABANDONED
+from task_02.trace import COMPLETED
+from task_02.trace import REFUSED
+from task_02.trace import TraceWriter
+from task_02.variates import Distribution
+from task_02.variates import VariateStreams
+
+
+class QSMConfig(NamedTuple):
+    #
+    channels_no: int
+    max_queue_sz: int
+    requests_rt: float
+    service_rt: float
+    v_param: float
 
 
 class QSM:
@@ -15,7 +33,12 @@ class QSM:
                  , max_queue_sz: int
                  , requests_rt: float
                  , service_rt: float
-                 , v_param: float):
+                 , v_param: float
+                 , streaming: bool = False
+                 , rng: Optional[Generator] = None
+                 , service: Optional[Distribution] = None
+                 , patience: Optional[Distribution] = None
+                 , trace: Optional[TraceWriter] = None):
         self.env = env
         self.channels_no = channels_no
         self.channels_res = Resource(env, channels_no)  # number of channels available
@@ -23,33 +46,42 @@ class QSM:
         self.requests_rt = requests_rt  # requests incoming ratio
         self.service_rt = service_rt  # requests processing ratio
         self.v_param = v_param  # exponential distribution parameter # v_param == beta == 1 / lambda
-        self.stats = Statistics(self)
+        self.stats = StreamingStatistics(self) if streaming else Statistics(self)
+        self.variates = VariateStreams(requests_rt, service_rt, v_param, rng, service, patience)
+        self.trace = trace  # optional per-request trace sink
 
 
     @staticmethod
     def run(env: Environment, model: 'QSM'):
         request_id = 0
         while True:
-            yield env.timeout(exponential(1.0 / model.requests_rt))
+            yield env.timeout(model.variates.arrivals.next())
             env.process(QSM._start_request_lifecycle(env, request_id, model))
             request_id += 1
 
 
     def _awaiting(self, request_id: int):
-        yield self.env.timeout(exponential(1.0 / self.v_param))
+        yield self.env.timeout(self.variates.patience.next())
 
 
     def _processing(self, request_id: int):
-        yield self.env.timeout(exponential(1.0 / self.service_rt))
+        yield self.env.timeout(self.variates.service.next())
+
+
+    def _observe_state(self) -> None:
+        self.stats.observe_state(self.env.now, len(self.channels_res.queue),
+                                 self.channels_res.count)
 
 
     @staticmethod
     def _start_request_lifecycle(env: Environment, request_id: int, model: 'QSM'):
-        model.stats.requests_awaiting.append(len(model.channels_res.queue))  # stats
-        model.stats.requests_processing.append(model.channels_res.count)  # stats
+        awaiting, processing = len(model.channels_res.queue), model.channels_res.count
+        model.stats.record_arrival(awaiting, processing)  # stats
+        trace = model.trace
 
         with model.channels_res.request() as request:
             cur_queue_length = len(model.channels_res.queue)
+            model._observe_state()  # stats
 
             if model.max_queue_sz != math.inf:
                 """
@@ -62,20 +94,30 @@ class QSM:
                     start_tstamp = env.now
 
                     happened_events = yield request | env.process(model._awaiting(request_id))
-                    model.stats.time_spent_awaiting.append(env.now - start_tstamp)  # stats
+                    model.stats.record_time_awaiting(env.now - start_tstamp)  # stats
 
                     if request in happened_events:
+                        model._observe_state()  # stats
+                        service_tstamp = env.now
                         yield env.process(model._processing(request_id))
                         model.stats.requests_completed_amount += 1  # stats
+                        if trace is not None:
+                            trace.write(start_tstamp, service_tstamp, env.now, awaiting,
+                                        processing, COMPLETED)
                     else:
                         model.stats.requests_rejected_amount += 1  # stats
-                    model.stats.time_spent_total.append(env.now - start_tstamp)  # stats
+                        if trace is not None:
+                            trace.write(start_tstamp, math.nan, env.now, awaiting, processing,
+                                        ABANDONED)
+                    model.stats.record_time_total(env.now - start_tstamp)  # stats
 
                 else:
                     """
                     If there are no places left in a queue, request is rejected.
                     """
                     model.stats.requests_rejected_amount += 1  # stats
+                    if trace is not None:
+                        trace.write(env.now, math.nan, env.now, awaiting, processing, REFUSED)
             else:
                 """
                 In case a queue is unbounded, request is simply put in the queue and awaits 
@@ -83,7 +125,14 @@ class QSM:
                 """
                 start_tstamp = env.now
                 yield request
-                model.stats.time_spent_awaiting.append(env.now - start_tstamp)  # stats
+                model._observe_state()  # stats
+                model.stats.record_time_awaiting(env.now - start_tstamp)  # stats
+                service_tstamp = env.now
                 yield env.process(model._processing(request_id))
-                model.stats.time_spent_total.append(env.now - start_tstamp)  # stats
+                model.stats.record_time_total(env.now - start_tstamp)  # stats
                 model.stats.requests_completed_amount += 1  # stats
+                if trace is not None:
+                    trace.write(start_tstamp, service_tstamp, env.now, awaiting, processing,
+                                COMPLETED)
+
+        model._observe_state()  # stats
@@ -0,0 +1,112 @@
+import math
+from typing import Optional
+from typing import Tuple
+
+from numpy import arange
+from numpy import flatnonzero
+from numpy import maximum
+from numpy import minimum
+from numpy import ndarray
+from numpy import zeros
+from numpy.random import Generator
+from numpy.random import default_rng
+
+from task_02.ctmc import empiric_probs_from_counters
+from task_02.replications import find_confidence_intervals_of_values
+
+
+class ReplicatedQSM:
+    """
+    R independent replicas of the same (finite) QSM configuration, simulated in lock
+    step as jump chains over NumPy state arrays: each loop iteration makes one jump in
+    every replica that has not reached until yet.
+
+        replicas = ReplicatedQSM(channels_no, max_queue_sz, requests_rt, service_rt,
+                                 v_param, replicas_no = 1000)
+        replicas.run(until = 4000)
+        replicas.find_confidence_intervals()
+    """
+
+    def __init__(self
+                 , channels_no: int
+                 , max_queue_sz: int
+                 , requests_rt: float
+                 , service_rt: float
+                 , v_param: float
+                 , replicas_no: int
+                 , rng: Optional[Generator] = None):
+        if channels_no + max_queue_sz == math.inf:
+            raise ValueError('Lock-step replicas need a finite amount of states')
+
+        self.channels_no = channels_no
+        self.max_queue_sz = max_queue_sz
+        self.requests_rt = requests_rt
+        self.service_rt = service_rt
+        self.v_param = v_param
+        self.replicas_no = replicas_no
+        self._rng = default_rng() if rng is None else rng
+
+        self._capacity = channels_no + max_queue_sz
+        k = arange(self._capacity + 1)
+        service = minimum(k, channels_no) * service_rt
+        abandonment = maximum(k - channels_no, 0) * v_param
+        total = requests_rt + service + abandonment
+        self._holding = 1.0 / total
+        self._p_arrival = requests_rt / total
+        self._p_arrival_or_service = (requests_rt + service) / total
+
+        self.now = zeros(replicas_no)
+        self.state = zeros(replicas_no, dtype = int)
+        self.arrivals_seen = zeros((replicas_no, self._capacity + 1))
+        self.time_in_state = zeros((replicas_no, self._capacity + 1))
+        self.requests_completed_amount = zeros(replicas_no)
+        self.requests_rejected_amount = zeros(replicas_no)
+
+
+    def run(self, until: float) -> None:
+        active = flatnonzero(self.now < until)
+        while len(active):
+            k = self.state[active]
+            now = self.now[active]
+            dt = self._rng.standard_exponential(len(active)) * self._holding[k]
+            u = self._rng.random(len(active))
+
+            """
+            Replicas whose next jump would cross until are stopped there.
+            """
+            crossing = now + dt >= until
+            dt[crossing] = until - now[crossing]
+            self.time_in_state[active, k] += dt
+            self.now[active] = now + dt
+
+            jumping = ~crossing
+            arrival = jumping & (u < self._p_arrival[k])
+            service = jumping & ~arrival & (u < self._p_arrival_or_service[k])
+            abandonment = jumping & ~arrival & ~service
+            full = k == self._capacity
+
+            self.arrivals_seen[active[arrival], k[arrival]] += 1
+            self.requests_completed_amount[active] += service
+            self.requests_rejected_amount[active] += (arrival & full) | abandonment
+            self.state[active] = k + (arrival & ~full) - service - abandonment
+
+            active = active[jumping]
+
+
+    def find_empiric_probs(self) -> Tuple:
+        """
+        The find_empiric_probs tuple with one value per replica: P is a
+        (replicas_no, states) array, every other value a (replicas_no,) array.
+        """
+        return empiric_probs_from_counters(self, self.arrivals_seen, self.time_in_state,
+                                           self.requests_completed_amount,
+                                           self.requests_rejected_amount, self._capacity)
+
+
+    def find_confidence_intervals(self, probability: float = 0.95) \
+            -> Tuple[Tuple[ndarray, ndarray], ...]:
+        """
+        (mean, half-width) across replicas for every value of find_empiric_probs, in the
+        same order; for P both are arrays over states.
+        """
+        return find_confidence_intervals_of_values(self.find_empiric_probs(), probability)
@@ -0,0 +1,108 @@
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import simpy
+from numpy import array
+from numpy import ndarray
+from numpy import sqrt
+from numpy import zeros
+from numpy.random import SeedSequence
+from numpy.random import default_rng
+from scipy.stats import t
+
+from common.pools import process_pool
+from task_02.ctmc import CTMCQSM
+from task_02.event_kernel import HeapQSM
+from task_02.qsm import QSM
+from task_02.qsm import QSMConfig
+
+
+def find_empiric_probs(model) -> Tuple:
+    return model.stats.find_empiric_probs()
+
+
+def simulate(config: QSMConfig, until: float, rng, engine: str = 'simpy'):
+    """
+    Runs one replica of config up to until and returns the model.
+    engine -- 'simpy' (QSM), 'heap' (HeapQSM) or 'ctmc' (CTMCQSM).
+    """
+    if engine == 'simpy':
+        env = simpy.Environment()
+        model = QSM(env, *config, rng = rng)
+        env.process(QSM.run(env, model))
+        env.run(until = until)
+    elif engine == 'heap':
+        model = HeapQSM(*config, rng = rng)
+        model.run(until)
+    elif engine == 'ctmc':
+        model = CTMCQSM(*config, rng = rng)
+        model.run(until)
+    else:
+        raise ValueError(f'Unknown engine: {engine}')
+    return model
+
+
+def run_replications(config: QSMConfig, replicas_no: int, seed, until: float,
+                     workers: Optional[int] = None,
+                     metrics: Callable = find_empiric_probs,
+                     engine: str = 'simpy') -> List[Tuple]:
+    """
+    Runs replicas_no independent replicas of config in a process pool. Replica i
+    draws from the i-th child of SeedSequence(seed), so the results are the same for
+    a given seed whatever the number of workers.
+
+    metrics -- a module-level function of the finished model, e.g.
+    task_03.statistics.find_empiric_probs. Returns its value for every replica.
+    """
+    tasks = [(config, until, seq, metrics, engine)
+             for seq in SeedSequence(seed).spawn(replicas_no)]
+    if workers == 1:
+        return list(map(_run_replica, tasks))
+
+    with process_pool(workers) as executor:
+        return list(executor.map(_run_replica, tasks))
+
+
+def _run_replica(task) -> Tuple:
+    config, until, seq, metrics, engine = task
+    return metrics(simulate(config, until, default_rng(seq), engine))
+
+
+def find_confidence_intervals(results: Sequence[Tuple], probability: float = 0.95) \
+        -> Tuple[Tuple[ndarray, ndarray], ...]:
+    """
+    (mean, half-width) across replicas for every value of the metrics tuple, in the
+    same order. Vector values (P) are padded with zeros to the longest replica.
+    """
+    return find_confidence_intervals_of_values([_stack(values) for values in zip(*results)],
+                                               probability)
+
+
+def find_confidence_intervals_of_values(values_per_metric: Sequence[ndarray],
+                                        probability: float = 0.95) \
+        -> Tuple[Tuple[ndarray, ndarray], ...]:
+    """
+    The same with the values already stacked: the first axis of each array runs over
+    the replicas.
+    """
+    intervals = []
+    for values in values_per_metric:
+        replicas_no = len(values)
+        quantile = t(replicas_no - 1).ppf((1 + probability) / 2)
+        mean = values.mean(axis = 0)
+        half_width = quantile * values.std(axis = 0, ddof = 1) / sqrt(replicas_no)
+        intervals.append((mean, half_width))
+    return tuple(intervals)
+
+
+def _stack(values) -> ndarray:
+    if not hasattr(values[0], '__len__'):
+        return array(values, dtype = float)
+
+    stacked = zeros((len(values), max(len(value) for value in values)))
+    for i, value in enumerate(values):
+        stacked[i, :len(value)] = value
+    return stacked
@@ -1,13 +1,46 @@
-from math import factorial
+from typing import Dict
 from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
 from typing import Tuple
 
 from numpy import add
 from numpy import array
-from numpy import prod
+from numpy import bincount
+from numpy import nan
+from numpy import ndarray
+
+from task_02 import theory
+
+
+"""
+Names of the values of find_empiric_probs / find_theoretical_probs after P.
+"""
+value_names = ('Q', 'A', 'P_rejected', 'avg_req_in_system', 'avg_req_in_queue',
+               'avg_req_time_in_system', 'avg_req_time_in_queue', 'avg_req_processed')
+
+
+class StatisticsMark(NamedTuple):
+    """
+    What a Statistics had recorded by the time now, see Statistics.mark.
+    """
+    now: float
+    arrivals: int  # len(requests_awaiting)
+    awaited: int  # len(time_spent_awaiting)
+    finished: int  # len(time_spent_total)
+    completed: int
+    rejected: int
+    time_in_state: List[float]
+    areas: List[float]  # [in system, processing, awaiting] areas since the start
+    batch_means: List['RunningMoments']  # of the time batches closed by then
 
 
 class Statistics:
+    #
+    time_batch_len = 10.0  # Simulated time per batch for time-average batch means
+    arrival_batches_no = 20  # Batches of consecutive arrivals for arrival-instant batch means
+
 
     def __init__(self, model):
         self.model = model
@@ -24,6 +57,120 @@ class Statistics:
 
         self.requests_processing = []  # Amount of processing requests, when new request incoming
 
+        self.time_in_state = []  # time_in_state[i] -- time spent with i requests in the system
+
+        self._observed_tstamp = 0.0  # When the state was observed last time
+        self._observed_state = (0, 0)  # (requests awaiting, requests processing) since then
+        self._areas = [0.0, 0.0, 0.0]  # [in system, processing, awaiting] areas since the start
+        """
+        Time batches: the areas of the open one and the moments of the means of the closed
+        ones, so that memory does not grow with the run length.
+        """
+        self._batch = 0
+        self._batch_areas = [0.0, 0.0, 0.0]
+        self._batch_means = [RunningMoments() for _ in range(3)]
+
+
+    def record_arrival(self, requests_awaiting: int, requests_processing: int) -> None:
+        self.requests_awaiting.append(requests_awaiting)
+        self.requests_processing.append(requests_processing)
+
+
+    def record_time_awaiting(self, time_spent: float) -> None:
+        self.time_spent_awaiting.append(time_spent)
+
+
+    def record_time_total(self, time_spent: float) -> None:
+        self.time_spent_total.append(time_spent)
+
+
+    def observe_state(self, now: float, requests_awaiting: int, requests_processing: int) -> None:
+        """
+        Called whenever the state may have changed: the previously observed state is
+        integrated over the time passed since it was observed.
+        """
+        start = self._observed_tstamp
+        if now > start:
+            awaiting, processing = self._observed_state
+            in_system = awaiting + processing
+
+            if in_system >= len(self.time_in_state):
+                self.time_in_state.extend([0.0] * (in_system + 1 - len(self.time_in_state)))
+            self.time_in_state[in_system] += now - start
+
+            values = (in_system, processing, awaiting)
+            for i, value in enumerate(values):
+                self._areas[i] += value * (now - start)
+
+            while start < now:
+                batch_end = (self._batch + 1) * self.time_batch_len
+                end = min(now, batch_end)
+                for i, value in enumerate(values):
+                    self._batch_areas[i] += value * (end - start)
+                start = end
+                if end == batch_end:
+                    self._close_batch()
+
+        self._observed_tstamp = now
+        self._observed_state = (requests_awaiting, requests_processing)
+
+
+    def _close_batch(self) -> None:
+        for moments, area in zip(self._batch_means, self._batch_areas):
+            moments.update(area / self.time_batch_len)
+        self._batch += 1
+        self._batch_areas = [0.0, 0.0, 0.0]
+
+
+    def observe_until(self, now: float) -> None:
+        """
+        Integrates the state observed last up to now, the state itself is unchanged.
+        """
+        self.observe_state(now, *self._observed_state)
+
+
+    def mark(self, now: float) -> StatisticsMark:
+        self.observe_until(now)
+        return StatisticsMark(now, len(self.requests_awaiting), len(self.time_spent_awaiting),
+                              len(self.time_spent_total), self.requests_completed_amount,
+                              self.requests_rejected_amount, list(self.time_in_state),
+                              list(self._areas), [m.copy() for m in self._batch_means])
+
+
+    def truncated(self, start: StatisticsMark) -> 'Statistics':
+        """
+        A Statistics of the same model holding only what was recorded after start.
+        Time batches are kept from the one open at start, so their variances are exact
+        when start.now is a multiple of time_batch_len.
+        """
+        truncated = Statistics(self.model)
+        truncated.requests_awaiting = self.requests_awaiting[start.arrivals:]
+        truncated.requests_processing = self.requests_processing[start.arrivals:]
+        truncated.time_spent_awaiting = self.time_spent_awaiting[start.awaited:]
+        truncated.time_spent_total = self.time_spent_total[start.finished:]
+        truncated.requests_completed_amount = self.requests_completed_amount - start.completed
+        truncated.requests_rejected_amount = self.requests_rejected_amount - start.rejected
+
+        before = start.time_in_state + [0.0] * (len(self.time_in_state) - len(start.time_in_state))
+        truncated.time_in_state = [now - then for now, then in zip(self.time_in_state, before)]
+        truncated._areas = [now - then for now, then in zip(self._areas, start.areas)]
+        truncated._batch = self._batch
+        truncated._batch_areas = list(self._batch_areas)
+        truncated._batch_means = [
+          now.without(then) for now, then in zip(self._batch_means, start.batch_means)
+        ]
+        truncated._observed_tstamp = self._observed_tstamp
+        truncated._observed_state = self._observed_state
+        return truncated
+
+
+    def get_amounts_of_requests_in_system_histogram(self, states_no: int) -> ndarray:
+        """
+        [i] -- how many incoming requests found i requests in the system.
+        """
+        return bincount(array(self.get_amounts_of_requests_in_system_at_time(), dtype = int),
+                        minlength = states_no)
+
 
     def get_amounts_of_requests_in_system_at_time(self) -> List:
         return add(array(self.requests_awaiting), array(self.requests_processing)).tolist()
@@ -49,7 +196,98 @@ class Statistics:
         return array(self.time_spent_awaiting).mean()
 
 
-    def find_empiric_probs(self) -> Tuple:
+    def find_time_weighted_probs(self, until: Optional[float] = None) -> Tuple:
+        """
+        Time averages over the whole run, as opposed to the values seen by incoming
+        requests: P[i] is the share of time with i requests in the system (i from 0),
+        then average amounts of requests in the system, in the queue and in processing,
+        and batch-means variances of those three estimators.
+
+        until -- the end of the run, the model's current time by default.
+        """
+        if until is None:
+            until = self.model.env.now if hasattr(self.model, 'env') else self.model.now
+        self.observe_state(until, *self._observed_state)
+
+        time_in_state = array(self.time_in_state)
+        total_time = time_in_state.sum()
+        P = (time_in_state / total_time).tolist()
+
+        avg_req_in_system, avg_req_processed, avg_req_in_queue = \
+            (area / total_time for area in self._areas)
+
+        """
+        The open batch is incomplete, so only the closed ones give batch means.
+        """
+        var_in_system, var_processed, var_in_queue = (
+          moments.variance / moments.count if moments.count > 1 else nan
+          for moments in self._batch_means
+        )
+
+        return (P, avg_req_in_system, avg_req_in_queue, avg_req_processed,
+                (var_in_system, var_in_queue, var_processed))
+
+
+    def find_arrival_instant_probs(self) -> Tuple:
+        """
+        The values seen by incoming requests, laid out like find_time_weighted_probs:
+        P[i] is the share of arrivals that found i requests in the system (i from 0),
+        then average amounts of requests in the system, in the queue and in processing,
+        and batch-means variances of those three estimators over arrival_batches_no
+        batches of consecutive arrivals.
+        """
+        histogram = self.get_amounts_of_requests_in_system_histogram(0)
+        P = (histogram / histogram.sum()).tolist()
+
+        return (P, self.get_average_amount_of_requests_in_system_at_time(),
+                self.get_average_amount_of_requests_in_queue_at_time(),
+                self.get_average_amount_of_requests_processed_at_time(),
+                self.find_arrival_instant_variances())
+
+
+    def find_arrival_instant_variances(self) -> Tuple[float, float, float]:
+        awaiting = array(self.requests_awaiting, dtype = float)
+        processing = array(self.requests_processing, dtype = float)
+        batches_no = min(self.arrival_batches_no, len(awaiting))
+        if batches_no < 2:
+            return nan, nan, nan
+
+        """
+        Equal batches of consecutive arrivals; the remainder of the division is dropped.
+        """
+        batch_len = len(awaiting) // batches_no
+        shape = (batches_no, batch_len)
+        awaiting = awaiting[:batches_no * batch_len].reshape(shape).mean(axis = 1)
+        processing = processing[:batches_no * batch_len].reshape(shape).mean(axis = 1)
+
+        var_in_system, var_in_queue, var_processed = (
+          values.var(ddof = 1) / batches_no for values in (awaiting + processing, awaiting,
+                                                           processing)
+        )
+        return var_in_system, var_in_queue, var_processed
+
+
+    def find_occupancy_estimates(self, until: Optional[float] = None) -> Tuple[Tuple, Tuple]:
+        """
+        Both estimators of the occupancy side by side, each with its variances:
+        (find_arrival_instant_probs(), find_time_weighted_probs(until)), P of both
+        padded with zeros to the same amount of states.
+        """
+        arrival_instant = list(self.find_arrival_instant_probs())
+        time_weighted = list(self.find_time_weighted_probs(until))
+
+        states_no = max(len(arrival_instant[0]), len(time_weighted[0]))
+        for estimates in (arrival_instant, time_weighted):
+            estimates[0] = estimates[0] + [0.0] * (states_no - len(estimates[0]))
+        return tuple(arrival_instant), tuple(time_weighted)
+
+
+    def find_empiric_probs(self, time_weighted: bool = False) -> Tuple:
+        """
+        time_weighted -- take P and the average amounts of requests (in the system, in
+        the queue, processed) from find_time_weighted_probs instead of from the states
+        seen by incoming requests. find_occupancy_estimates gives both, with variances.
+        """
         requests_passed_total = self.requests_completed_amount + self.requests_rejected_amount
 
         """
@@ -58,17 +296,15 @@ class Statistics:
         """
         P = []
         """
-        req_proc_and_await_at_time -- vector, where each component shows how many
-        requests there had been processing and in a queue by the time a new request came.
+        req_proc_and_await_histogram -- vector, where each component i shows how many
+        times there had been i requests processing and in a queue by the time a new
+        request came.
         """
-        req_proc_and_await_at_time = add(
-          array(self.requests_processing),
-          array(self.requests_awaiting)
-        )
         max_req_proc_and_await_amount = self.model.channels_no + self.model.max_queue_sz
+        req_proc_and_await_histogram = \
+            self.get_amounts_of_requests_in_system_histogram(max_req_proc_and_await_amount + 1)
         for i in range(1, max_req_proc_and_await_amount + 1):
-            matches = req_proc_and_await_at_time[req_proc_and_await_at_time == i]
-            P.append(len(matches) / requests_passed_total)
+            P.append(req_proc_and_await_histogram[i] / requests_passed_total)
 
         """
         P_rejected -- probability for a request to be rejected.
@@ -91,61 +327,217 @@ class Statistics:
         avg_req_time_in_system = self.get_average_time_of_request_spent_in_system()
         avg_req_time_in_queue = self.get_average_time_of_request_spent_in_queue()
 
+        if time_weighted:
+            (P_time, avg_req_in_system, avg_req_in_queue, avg_req_processed, _) = \
+                self.find_time_weighted_probs()
+            P_time += [0.0] * (max_req_proc_and_await_amount + 1 - len(P_time))
+            P = P_time[1:max_req_proc_and_await_amount + 1]
+
         return (P, Q, A, P_rejected, avg_req_in_system, avg_req_in_queue, avg_req_time_in_system,
                 avg_req_time_in_queue, avg_req_processed)
 
 
     def find_theoretical_probs(self):
-        ro = self.model.requests_rt / self.model.service_rt
-        betta = self.model.v_param / self.model.service_rt
-
         """
         P -- array of probabilities. P[i] is the probability, that
         req_proc_and_await_at_time[i] == i.
         """
-        P: list = []
-        p00 = sum([ro ** i / factorial(i) for i in range(self.model.channels_no + 1)])
-        p01 = (ro ** self.model.channels_no / factorial(self.model.channels_no))
-        p02 = sum([
-          ro ** i / (prod([self.model.channels_no + t * betta for t in range(1, i + 1)]))
-          for i in range(1, self.model.max_queue_sz + 1)
-        ])
-        p0 = (p00 + p01 * p02) ** -1
+        (P, *values) = theory.find_theoretical_probs(
+          self.model.channels_no, self.model.max_queue_sz, self.model.requests_rt,
+          self.model.service_rt, self.model.v_param
+        )
+        return (list(P), *values)
 
-        P.append(p0)
-        for i in range(1, self.model.channels_no + 1):
-            px = (ro ** i / factorial(i)) * p0
-            P.append(px)
 
-        pn = P[-1]
-        for i in range(1, self.model.max_queue_sz):
-            px = (ro ** i / prod([self.model.channels_no + t * betta for t in range(1, i + 1)])) \
-                 * pn
-            P.append(px)
+class StreamingStatistics(Statistics):
+    """
+    Same outputs as Statistics, in memory that does not grow with the run length:
+    per-request values are folded into running sums, Welford moments and a histogram
+    of the states seen by incoming requests, instead of being kept in lists. The lists
+    inherited from Statistics stay empty.
 
-        P_rejected = P[-1]
+    quantiles -- probabilities of time-in-queue quantiles to track with P².
+    """
 
-        Q = 1 - P[-1]
+    def __init__(self, model, quantiles: Sequence[float] = (0.5, 0.9, 0.99)):
+        super().__init__(model)
+        self._arrivals_amount = 0
+        self._requests_awaiting_sum = 0
+        self._requests_processing_sum = 0
+        self._requests_in_system_histogram = []
+        self._time_spent_awaiting = RunningMoments()
+        self._time_spent_total = RunningMoments()
+        self._time_spent_awaiting_quantiles = [P2Quantile(p) for p in quantiles]
 
-        A = Q * self.model.requests_rt
 
-        avg_req_in_queue = sum([
-          i * pn * (ro ** i) / prod([self.model.channels_no + t * betta for t in range(1, i + 1)])
-          for i in range(1, self.model.max_queue_sz + 1)]
-        )
+    def record_arrival(self, requests_awaiting: int, requests_processing: int) -> None:
+        self._arrivals_amount += 1
+        self._requests_awaiting_sum += requests_awaiting
+        self._requests_processing_sum += requests_processing
 
-        avg_req_in_system = sum([
-          index * p0 * (ro ** index) / factorial(index)
-          for index in range(1, self.model.channels_no + 1)
-        ]) + sum([
-          (self.model.channels_no + index) * pn * ro ** index
-          / prod(array([self.model.channels_no + t * betta for t in range(1, index + 1)]))
-          for index in range(1, self.model.max_queue_sz + 1)
-        ])
+        histogram = self._requests_in_system_histogram
+        state = requests_awaiting + requests_processing
+        if state >= len(histogram):
+            histogram.extend([0] * (state + 1 - len(histogram)))
+        histogram[state] += 1
 
-        avg_req_processed = A / self.model.service_rt
-        avg_req_time_in_system = avg_req_in_system / self.model.requests_rt
-        avg_req_time_in_queue = Q * ro / self.model.requests_rt
 
-        return (P, Q, A, P_rejected, avg_req_in_system, avg_req_in_queue, avg_req_time_in_system,
-                avg_req_time_in_queue, avg_req_processed)
+    def record_time_awaiting(self, time_spent: float) -> None:
+        self._time_spent_awaiting.update(time_spent)
+        for quantile in self._time_spent_awaiting_quantiles:
+            quantile.update(time_spent)
+
+
+    def record_time_total(self, time_spent: float) -> None:
+        self._time_spent_total.update(time_spent)
+
+
+    def get_amounts_of_requests_in_system_histogram(self, states_no: int) -> ndarray:
+        histogram = array(self._requests_in_system_histogram, dtype = int)
+        histogram.resize(max(states_no, len(histogram)))
+        return histogram
+
+
+    def get_average_amount_of_requests_processed_at_time(self) -> float:
+        return self._requests_processing_sum / self._arrivals_amount
+
+
+    def find_arrival_instant_variances(self) -> Tuple[float, float, float]:
+        """
+        The sequence of states seen by arrivals is not kept, so there are no batches.
+        """
+        return nan, nan, nan
+
+
+    def get_average_amount_of_requests_in_system_at_time(self) -> float:
+        return (self._requests_processing_sum + self._requests_awaiting_sum) / self._arrivals_amount
+
+
+    def get_average_amount_of_requests_in_queue_at_time(self) -> float:
+        return self._requests_awaiting_sum / self._arrivals_amount
+
+
+    def get_average_time_of_request_spent_in_system(self) -> float:
+        return self._time_spent_total.mean
+
+
+    def get_average_time_of_request_spent_in_queue(self) -> float:
+        return self._time_spent_awaiting.mean
+
+
+    def get_variance_of_time_of_request_spent_in_system(self) -> float:
+        return self._time_spent_total.variance
+
+
+    def get_variance_of_time_of_request_spent_in_queue(self) -> float:
+        return self._time_spent_awaiting.variance
+
+
+    def get_quantiles_of_time_of_request_spent_in_queue(self) -> Dict[float, float]:
+        return {quantile.p: quantile.value() for quantile in self._time_spent_awaiting_quantiles}
+
+
+def ratio_variance(values, weights) -> float:
+    """
+    Batch-means variance of sum(values) / sum(weights) for batches of unequal weight.
+    """
+    batches_no = len(values)
+    ratio = values.sum() / weights.sum()
+    return ((values - ratio * weights) ** 2).sum() / (batches_no * (batches_no - 1)) \
+        / weights.mean() ** 2
+
+
+class RunningMoments:
+    #
+    __slots__ = ('count', 'mean', 'M2')
+
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.M2 = 0.0
+
+
+    def update(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.M2 += delta * (x - self.mean)
+
+
+    @property
+    def variance(self) -> float:
+        return self.M2 / (self.count - 1)
+
+
+    def copy(self) -> 'RunningMoments':
+        moments = RunningMoments()
+        moments.count, moments.mean, moments.M2 = self.count, self.mean, self.M2
+        return moments
+
+
+    def without(self, first: 'RunningMoments') -> 'RunningMoments':
+        """
+        Moments of the values that came after first, a copy taken of self earlier
+        (the merge of Chan et al. solved for the second part).
+        """
+        rest = RunningMoments()
+        rest.count = self.count - first.count
+        if rest.count:
+            rest.mean = (self.count * self.mean - first.count * first.mean) / rest.count
+            delta = rest.mean - first.mean
+            rest.M2 = self.M2 - first.M2 - delta ** 2 * first.count * rest.count / self.count
+        return rest
+
+
+class P2Quantile:
+    """
+    P² estimator of the p-quantile (Jain, Chlamtac): five markers, O(1) memory.
+    """
+
+    def __init__(self, p: float):
+        self.p = p
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+
+    def update(self, x: float) -> None:
+        h, n = self._heights, self._positions
+        if len(h) < 5:
+            h.append(x)
+            h.sort()
+            return
+
+        if x < h[0]:
+            h[0], k = x, 0
+        elif x >= h[4]:
+            h[4], k = x, 3
+        else:
+            k = next(i for i in range(1, 5) if x < h[i]) - 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                  (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+                  + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not h[i - 1] < height < h[i + 1]:
+                    height = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = height
+                n[i] += d
+
+
+    def value(self) -> float:
+        h = self._heights
+        if len(h) < 5:
+            return sorted(h)[min(int(self.p * len(h)), len(h) - 1)] if h else float('nan')
+        return h[2]
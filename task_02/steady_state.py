@@ -0,0 +1,169 @@
+import math
+from typing import Callable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from numpy import arange
+from numpy import broadcast_to
+from numpy import concatenate
+from numpy import full
+from numpy import minimum
+from numpy import maximum
+from numpy import ndarray
+from numpy import zeros
+from scipy.sparse import coo_matrix
+from scipy.sparse import csr_matrix
+from scipy.sparse import diags
+from scipy.sparse.linalg import LinearOperator
+from scipy.sparse.linalg import bicgstab
+from scipy.sparse.linalg import spilu
+from scipy.sparse.linalg import spsolve
+
+
+class Transition(NamedTuple):
+    """
+    A family of jumps of a chain with states 0..states_no-1: from every state s to
+    target(s) with intensity rate(s). Both functions get the array of all states.
+    """
+    rate: Callable[[ndarray], ndarray]
+    target: Callable[[ndarray], ndarray]
+
+
+def build_generator(states_no: int, transitions: Sequence[Transition]) -> csr_matrix:
+    """
+    The generator matrix Q: Q[s, s'] is the total intensity of jumps s -> s', the
+    diagonal makes every row sum up to zero. Zero rates and jumps out of the state
+    space are dropped.
+    """
+    states = arange(states_no)
+    rows, cols, rates = [], [], []
+    for transition in transitions:
+        rate = broadcast_to(transition.rate(states), states.shape).astype(float)
+        target = broadcast_to(transition.target(states), states.shape)
+        kept = (rate > 0) & (target != states) & (target >= 0) & (target < states_no)
+        rows.append(states[kept])
+        cols.append(target[kept])
+        rates.append(rate[kept])
+
+    rows, cols, rates = concatenate(rows), concatenate(cols), concatenate(rates)
+    Q = coo_matrix((rates, (rows, cols)), shape = (states_no, states_no)).tocsr()
+    return (Q - diags(Q.sum(axis = 1).A1)).tocsr()
+
+
+def solve_steady_state(Q: csr_matrix, method: str = 'direct', anchor: int = 0,
+                       tol: float = 1e-12) -> ndarray:
+    """
+    pi with pi Q = 0, sum(pi) = 1. One balance equation is redundant; it is replaced by
+    pi[anchor] = 1 and the solution is normalized afterwards. Unlike a row of ones this
+    keeps the matrix as sparse as Q. anchor should be a state of non-negligible
+    probability, otherwise the unnormalized solution may overflow.
+
+    The system is solved by sparse LU ('direct') or by BiCGSTAB preconditioned with an
+    incomplete LU ('iterative').
+    """
+    states_no = Q.shape[0]
+    balance = diags((arange(states_no) != anchor).astype(float)) @ Q.T
+    pin = coo_matrix(([1.0], ([anchor], [anchor])), shape = Q.shape)
+    A = (balance + pin).tocsc()
+    b = zeros(states_no)
+    b[anchor] = 1.0
+
+    if method == 'direct':
+        pi = spsolve(A, b)
+    elif method == 'iterative':
+        ilu = spilu(A)
+        pi, info = bicgstab(A, b, M = LinearOperator(A.shape, ilu.solve), rtol = tol)
+        if info != 0:
+            raise RuntimeError(f'BiCGSTAB did not converge: {info}')
+    else:
+        raise ValueError(f'Unknown method: {method}')
+
+    pi = maximum(pi, 0)  # round-off may leave tiny negative values
+    return pi / pi.sum()
+
+
+def qsm_transitions(capacity: int, arrival: Callable, service: Callable,
+                    abandonment: Callable) -> List[Transition]:
+    """
+    QSM as a birth-death chain over the number of requests in the system (0..capacity):
+    arrival(k) moves k -> k + 1, service(k) and abandonment(k) move k -> k - 1.
+    """
+    return [
+      Transition(lambda k: (k < capacity) * arrival(k), lambda k: k + 1),
+      Transition(lambda k: service(k) + abandonment(k), lambda k: k - 1),
+    ]
+
+
+def find_steady_state_probs(channels_no: int, max_queue_sz: int, requests_rt: float,
+                            service_rt: float, v_param: float,
+                            arrival: Optional[Callable] = None,
+                            service: Optional[Callable] = None,
+                            abandonment: Optional[Callable] = None,
+                            states_no: Optional[int] = None,
+                            method: str = 'direct') -> Tuple:
+    """
+    Numerical counterpart of Statistics.find_theoretical_probs for QSM variants without
+    a closed form. Rates are functions of the array of states k (requests in the
+    system); by default they are those of QSM:
+
+        arrival(k) = requests_rt               (state dependent arrivals, balking...)
+        service(k) = min(k, channels_no) * service_rt
+        abandonment(k) = max(k - channels_no, 0) * v_param
+
+    arrival(k) at k = capacity is the rate of requests refused for lack of room.
+    An unbounded system is truncated to states_no states.
+
+    Returns the find_theoretical_probs tuple: P holds p_0..p_{n+m-1} (p_0..p_n if m = 0); the
+    other values are exact for the chain, P_rejected counting refused and abandoned
+    requests like the empiric one.
+    """
+    capacity = channels_no + max_queue_sz
+    if capacity == math.inf:
+        if states_no is None:
+            raise ValueError('An unbounded system needs states_no to be truncated')
+        capacity = states_no - 1
+    capacity = int(capacity)
+
+    if arrival is None:
+        arrival = lambda k: full(k.shape, float(requests_rt))
+    if service is None:
+        service = lambda k: minimum(k, channels_no) * service_rt
+    if abandonment is None:
+        abandonment = lambda k: maximum(k - channels_no, 0) * v_param
+
+    generator = build_generator(capacity + 1,
+                                qsm_transitions(capacity, arrival, service, abandonment))
+    """
+    Pin the state around which the mass is: the load ro, capped by the channels.
+    """
+    anchor = int(min(requests_rt / service_rt, channels_no, capacity))
+    pi = solve_steady_state(generator, method, anchor)
+
+    k = arange(capacity + 1)
+    arrivals = broadcast_to(arrival(k), k.shape)
+    offered = pi @ arrivals
+    admitted = offered - pi[-1] * arrivals[-1]
+
+    """
+    A -- absolute throughput, the flow of completed requests.
+    """
+    A = pi @ broadcast_to(service(k), k.shape)
+    Q = A / offered
+    P_rejected = 1 - Q
+
+    avg_req_in_system = pi @ k
+    avg_req_processed = pi @ minimum(k, channels_no)
+    avg_req_in_queue = avg_req_in_system - avg_req_processed
+
+    """
+    Little's law over the admitted requests.
+    """
+    avg_req_time_in_system = avg_req_in_system / admitted
+    avg_req_time_in_queue = avg_req_in_queue / admitted
+
+    P = pi[:-1] if capacity > channels_no else pi
+    return (P.tolist(), Q, A, P_rejected, avg_req_in_system, avg_req_in_queue,
+            avg_req_time_in_system, avg_req_time_in_queue, avg_req_processed)
@@ -0,0 +1,187 @@
+import csv
+import math
+import os
+from concurrent.futures import as_completed
+from glob import glob
+from itertools import product
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Set
+
+from numpy import array
+from numpy import ndarray
+from numpy.random import SeedSequence
+from numpy.random import default_rng
+
+from common.pools import process_pool
+from task_02.qsm import QSMConfig
+from task_02.replications import simulate
+from task_02.statistics import value_names
+
+
+def build_grid(**params: Sequence) -> List[QSMConfig]:
+    """
+    Every combination of the given values, e.g.
+        build_grid(channels_no = range(1, 6), max_queue_sz = [5, 10], requests_rt = [10],
+                   service_rt = [5], v_param = [0.5, 1])
+    """
+    return [QSMConfig(*values) for values in product(*(params[f] for f in QSMConfig._fields))]
+
+
+def run_sweep(points: Sequence[QSMConfig], until: float, seed, directory: str,
+              workers: Optional[int] = None, engine: str = 'ctmc',
+              shard_size: int = 1000) -> None:
+    """
+    Simulates every point up to until and appends one row per point (its parameters,
+    the empiric and the theoretic values) to CSV shards in directory as soon as the
+    point is finished. Every row is flushed to disk, so an interrupted sweep loses
+    only the points in flight: called again with the same points and directory, it
+    skips the ones already written. Rows written for other points (a different grid)
+    raise ValueError.
+
+    Point i always draws from the i-th child of SeedSequence(seed), whatever the order
+    it is run in. Cheap points (few expected events) are scheduled first.
+    """
+    if any(p.channels_no + p.max_queue_sz == math.inf for p in points):
+        raise ValueError('Theoretic probabilities need a finite amount of states')
+
+    states_no = max(int(p.channels_no + p.max_queue_sz) for p in points)
+    seqs = SeedSequence(seed).spawn(len(points))
+    done = _completed_points(directory, points)
+    tasks = sorted(
+      ((i, point, until, seqs[i], engine) for i, point in enumerate(points) if i not in done),
+      key = lambda task: _cost(task[1], until)
+    )
+    if not tasks:
+        return
+
+    os.makedirs(directory, exist_ok = True)
+    with _ShardWriter(directory, _header(states_no), shard_size) as writer:
+        if workers == 1:
+            for task in tasks:
+                writer.write(_run_point(task))
+            return
+
+        with process_pool(workers) as executor:
+            futures = [executor.submit(_run_point, task) for task in tasks]
+            for future in as_completed(futures):
+                writer.write(future.result())
+
+
+def load_sweep(directory: str) -> Dict[str, ndarray]:
+    """
+    All rows written so far, as one array per column, ordered by point. Shards written
+    for grids of different sizes are merged; missing P columns are zeros.
+    """
+    rows = sorted((dict(zip(header, row)) for header, row in _read_rows(directory)),
+                  key = lambda row: row['point'])
+    if not rows:
+        return {}
+
+    states_no = max(sum(name.startswith('P_emp_') for name in row) for row in rows)
+    return {name: array([row.get(name, 0.0) for row in rows]) for name in _header(states_no)}
+
+
+def _cost(point: QSMConfig, until: float) -> float:
+    """
+    Expected events of a run, at most: arrivals plus as many departures.
+    """
+    return 2 * until * point.requests_rt
+
+
+def _run_point(task) -> List[float]:
+    i, point, until, seq, engine = task
+    model = simulate(point, until, default_rng(seq), engine)
+    empiric = model.stats.find_empiric_probs()
+    theoretic = model.stats.find_theoretical_probs()
+    return [i, *point, *empiric[1:], *theoretic[1:], list(empiric[0]), list(theoretic[0])]
+
+
+def _header(states_no: int) -> List[str]:
+    return ['point', *QSMConfig._fields,
+            *(f'{name}_emp' for name in value_names),
+            *(f'{name}_theor' for name in value_names),
+            *(f'P_emp_{k}' for k in range(states_no)),
+            *(f'P_theor_{k}' for k in range(states_no))]
+
+
+def _completed_points(directory: str, points: Sequence[QSMConfig]) -> Set[int]:
+    done = set()
+    for header, row in _read_rows(directory):
+        row = dict(zip(header, row))
+        i = int(row['point'])
+        written = tuple(row[field] for field in QSMConfig._fields)
+        if i >= len(points) or written != tuple(points[i]):
+            raise ValueError(f'Point {i} in {directory} was written for {written}, '
+                             f'not for {tuple(points[i]) if i < len(points) else None}')
+        done.add(i)
+    return done
+
+
+def _read_rows(directory: str):
+    """
+    Yields (header, row) for every complete row of every shard. A row cut short by an
+    interruption has fewer fields than the header and is skipped.
+    """
+    for path in sorted(glob(os.path.join(directory, 'shard_*.csv'))):
+        with open(path, newline = '') as file:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            for row in reader:
+                if header is not None and len(row) == len(header):
+                    yield header, [float(value) for value in row]
+
+
+class _ShardWriter:
+    """
+    Appends rows to shard_<n>.csv files of at most shard_size rows each. P vectors
+    are padded with zeros to the header width.
+    """
+
+    def __init__(self, directory: str, header: List[str], shard_size: int):
+        self._directory = directory
+        self._header = header
+        self._shard_size = shard_size
+        self._states_no = sum(name.startswith('P_emp_') for name in header)
+        self._shard_no = len(glob(os.path.join(directory, 'shard_*.csv')))
+        self._file = None
+        self._rows_in_shard = 0
+
+
+    def __enter__(self) -> '_ShardWriter':
+        return self
+
+
+    def __exit__(self, *exc_info) -> None:
+        self._close()
+
+
+    def write(self, row: List) -> None:
+        if self._file is None or self._rows_in_shard == self._shard_size:
+            self._open_next()
+
+        *values, P_emp, P_theor = row
+        padding = [0.0] * self._states_no
+        self._writer.writerow([*values, *(P_emp + padding)[:self._states_no],
+                               *(P_theor + padding)[:self._states_no]])
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._rows_in_shard += 1
+
+
+    def _open_next(self) -> None:
+        self._close()
+        path = os.path.join(self._directory, f'shard_{self._shard_no:05d}.csv')
+        self._file = open(path, 'w', newline = '')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self._header)
+        self._shard_no += 1
+        self._rows_in_shard = 0
+
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
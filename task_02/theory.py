@@ -0,0 +1,108 @@
+import math
+from functools import lru_cache
+from typing import Tuple
+
+from numpy import arange
+from numpy import asarray
+from numpy import broadcast_arrays
+from numpy import concatenate
+from numpy import cumsum
+from numpy import exp
+from numpy import inf
+from numpy import log
+from numpy import maximum
+from numpy import ndarray
+from numpy import where
+from numpy import zeros
+from scipy.special import gammaln
+from scipy.special import logsumexp
+
+
+"""
+For n channels, m places in the queue, ro = lambda / mu and betta = v / mu the stationary
+probabilities are
+
+    p_i = p0 * a_i,            a_i = ro^i / i!,                            0 <= i <= n
+    p_n+j = p_n * b_j,         b_j = ro^j / prod_{t=1..j} (n + t * betta), 1 <= j <= m
+
+Both a_i and b_j are kept as logarithms, built by running sums of log terms, so every
+configuration costs O(n + m) and neither factorials nor powers overflow.
+
+The values and the layout are those of Statistics.find_theoretical_probs: P holds
+p_0..p_n+m-1 and P_rejected is its last value.
+"""
+
+
+@lru_cache(maxsize = 1024)
+def find_theoretical_probs(channels_no: int, max_queue_sz: int, requests_rt: float,
+                           service_rt: float, v_param: float) -> Tuple:
+    """
+    Memoized per parameter tuple; P is returned as a tuple.
+    """
+    (P, Q, A, P_rejected, avg_req_in_system, avg_req_in_queue, avg_req_time_in_system,
+     avg_req_time_in_queue, avg_req_processed) = \
+        find_theoretical_probs_grid(channels_no, max_queue_sz, requests_rt, service_rt,
+                                    v_param)
+
+    states_no = channels_no + max(max_queue_sz, 1)
+    return (tuple(P[0, :states_no].tolist()), Q.item(), A.item(), P_rejected.item(),
+            avg_req_in_system.item(), avg_req_in_queue.item(), avg_req_time_in_system.item(),
+            avg_req_time_in_queue.item(), avg_req_processed.item())
+
+
+def find_theoretical_probs_grid(channels_no, max_queue_sz, requests_rt, service_rt,
+                                v_param) -> Tuple[ndarray, ...]:
+    """
+    Parameters are broadcast against each other and flattened into G configurations.
+    P is a (G, max(n + m)) array padded with zeros, every other value a (G,) array.
+    """
+    n, m, requests_rt, service_rt, v_param = (
+      asarray(param).ravel()
+      for param in broadcast_arrays(channels_no, max_queue_sz, requests_rt, service_rt,
+                                    v_param)
+    )
+    if (n == math.inf).any() or (m == math.inf).any():
+        raise ValueError('Theoretic probabilities need a finite amount of states')
+    n, m = n.astype(int), m.astype(int)
+
+    ro = requests_rt / service_rt
+    betta = v_param / service_rt
+    log_ro = log(ro)[:, None]
+
+    """
+    log a_i for i = 0..max(n), log b_j for j = 1..max(m); -inf past a row's own n, m.
+    """
+    i = arange(n.max() + 1)
+    log_a = where(i <= n[:, None], i * log_ro - gammaln(i + 1), -inf)
+
+    j = arange(1, m.max() + 1)
+    log_b = j * log_ro - cumsum(log(n[:, None] + j * betta[:, None]), axis = 1)
+    log_b = where(j <= m[:, None], log_b, -inf)
+
+    log_a_n = log_a[arange(len(n)), n][:, None]
+    log_p0 = -logsumexp(concatenate([log_a, log_a_n + log_b], axis = 1), axis = 1)
+    a = exp(log_a + log_p0[:, None])  # p_0..p_n
+    b = exp(log_b + log_a_n + log_p0[:, None])  # p_n+1..p_n+m
+
+    """
+    P -- p_0..p_n, then p_n+1..p_n+m-1, every row shifted to its own n.
+    """
+    states_no = n + maximum(m, 1)
+    P = zeros((len(n), states_no.max()))
+    P[:, :len(i)] = a
+    rows, cols = (j <= m[:, None] - 1).nonzero()
+    P[rows, n[rows] + j[cols]] = b[rows, cols]
+
+    P_rejected = P[arange(len(n)), states_no - 1]
+    Q = 1 - P_rejected
+    A = Q * requests_rt
+
+    avg_req_in_queue = (b * j).sum(axis = 1)
+    avg_req_in_system = (a * i).sum(axis = 1) + (b * (n[:, None] + j)).sum(axis = 1)
+
+    avg_req_processed = A / service_rt
+    avg_req_time_in_system = avg_req_in_system / requests_rt
+    avg_req_time_in_queue = Q * ro / requests_rt
+
+    return (P, Q, A, P_rejected, avg_req_in_system, avg_req_in_queue, avg_req_time_in_system,
+            avg_req_time_in_queue, avg_req_processed)
@@ -0,0 +1,171 @@
+import math
+import os
+from typing import Iterator
+from typing import Tuple
+
+from numpy import array
+from numpy import bincount
+from numpy import concatenate
+from numpy import dtype
+from numpy import memmap
+from numpy import ndarray
+from numpy import where
+from numpy import zeros
+
+
+"""
+One fixed-width record per request that left the system, in the order they left.
+awaiting and processing are the amounts of requests the request found on arrival;
+service_start is nan for requests that were never served.
+"""
+trace_dtype = dtype([
+  ('arrival', 'f8'),
+  ('service_start', 'f8'),
+  ('departure', 'f8'),
+  ('awaiting', 'i4'),
+  ('processing', 'i4'),
+  ('outcome', 'u1'),
+])
+
+COMPLETED = 0
+ABANDONED = 1  # left the queue out of impatience
+REFUSED = 2  # found no place in the queue
+
+_buffer_size = 1 << 16  # records kept in memory between bulk writes
+_chunk_size = 1 << 22  # records processed at once by the reader
+
+
+class TraceWriter:
+    """
+    Appends trace records to a raw binary file of trace_dtype records. Records are
+    buffered as tuples and written in bulk; close (or leave the with block) at the end
+    of the run to write the rest. An existing file at path is overwritten unless append
+    is set, then the records continue it (e.g. a run continued with a larger until).
+
+        with TraceWriter('run.trace') as trace:
+            model = QSM(env, ..., trace = trace)
+            env.run(until = 4000)
+        TraceReader('run.trace', model).find_empiric_probs()
+    """
+
+    def __init__(self, path: str, buffer_size: int = _buffer_size, append: bool = False):
+        self._file = open(path, 'ab' if append else 'wb')
+        self._buffer_size = buffer_size
+        self._buffer = []
+
+
+    def __enter__(self) -> 'TraceWriter':
+        return self
+
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+    def write(self, arrival: float, service_start: float, departure: float, awaiting: int,
+              processing: int, outcome: int) -> None:
+        self._buffer.append((arrival, service_start, departure, awaiting, processing, outcome))
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._file.write(array(self._buffer, dtype = trace_dtype).tobytes())
+            self._buffer = []
+        self._file.flush()
+
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+class TraceReader:
+    """
+    A trace mapped into memory read-only, so its size is bounded by the disk, not RAM.
+    model -- anything with channels_no, max_queue_sz and requests_rt (QSM, QSMConfig).
+    """
+
+    def __init__(self, path: str, model, chunk_size: int = _chunk_size):
+        self.model = model
+        self._chunk_size = chunk_size
+        if os.path.getsize(path):
+            self.records = memmap(path, dtype = trace_dtype, mode = 'r')
+        else:
+            self.records = zeros(0, dtype = trace_dtype)
+
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+    def chunks(self) -> Iterator[ndarray]:
+        for start in range(0, len(self.records), self._chunk_size):
+            yield self.records[start:start + self._chunk_size]
+
+
+    def find_empiric_probs(self) -> Tuple:
+        """
+        The values of Statistics.find_empiric_probs computed over the trace, one chunk
+        at a time. For an unbounded system P goes up to the largest state seen.
+        """
+        completed = rejected = 0
+        histogram = zeros(0)
+        in_system_sum = processing_sum = awaiting_sum = 0.0
+        time_in_system_sum = time_in_queue_sum = 0.0
+        left_amount = 0  # requests that were not refused
+
+        for chunk in self.chunks():
+            outcome = chunk['outcome']
+            awaiting = chunk['awaiting'].astype(float)
+            processing = chunk['processing'].astype(float)
+            in_system = awaiting + processing
+
+            completed += int((outcome == COMPLETED).sum())
+            rejected += int((outcome != COMPLETED).sum())
+
+            histogram = _add(histogram, bincount(chunk['awaiting'] + chunk['processing']))
+
+            in_system_sum += in_system.sum()
+            processing_sum += processing.sum()
+            awaiting_sum += awaiting.sum()
+
+            left = outcome != REFUSED
+            arrival = chunk['arrival'][left]
+            left_queue = where(outcome[left] == COMPLETED, chunk['service_start'][left],
+                               chunk['departure'][left])
+            time_in_system_sum += (chunk['departure'][left] - arrival).sum()
+            time_in_queue_sum += (left_queue - arrival).sum()
+            left_amount += int(left.sum())
+
+        requests_passed_total = completed + rejected
+        capacity = self.model.channels_no + self.model.max_queue_sz
+        max_state = int(capacity) if capacity != math.inf else len(histogram) - 1
+        histogram = _add(histogram, zeros(max_state + 1))
+
+        """
+        P -- array of probabilities, laid out like in Statistics.find_empiric_probs.
+        """
+        P = (histogram[1:max_state + 1] / requests_passed_total).tolist()
+
+        P_rejected = rejected / requests_passed_total
+        Q = 1 - P_rejected
+        A = Q * self.model.requests_rt
+
+        avg_req_in_system = in_system_sum / requests_passed_total
+        avg_req_processed = processing_sum / requests_passed_total
+        avg_req_in_queue = awaiting_sum / requests_passed_total
+        avg_req_time_in_system = time_in_system_sum / left_amount
+        avg_req_time_in_queue = time_in_queue_sum / left_amount
+
+        return (P, Q, A, P_rejected, avg_req_in_system, avg_req_in_queue, avg_req_time_in_system,
+                avg_req_time_in_queue, avg_req_processed)
+
+
+def _add(histogram: ndarray, counts: ndarray) -> ndarray:
+    if len(counts) > len(histogram):
+        histogram = concatenate([histogram, zeros(len(counts) - len(histogram))])
+    histogram[:len(counts)] += counts
+    return histogram
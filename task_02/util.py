@@ -1,9 +1,12 @@
 import matplotlib.pyplot as plt
 import prettytable as tbl
-from numpy import append
 from numpy import around
-from numpy import array_split
+from numpy import asarray
+from numpy import bincount
+from numpy import cumsum
+from numpy import full
 from numpy import ndarray
+from numpy import zeros
 
 
 sep = '\n>>>>\n'
@@ -69,26 +72,42 @@ def draw_probabilities_histograms(P_emp: ndarray, P_theor: ndarray) -> None:
     ax3.bar(range(len(P_theor)), P_theor - P_emp, width = 0.5)
     ax3.axhline(y = 0, xmin = 0, xmax = len(P_theor), color = 'red')
 
-    plt.show()
+
+def find_running_probabilities(requests_in_system_at_time: ndarray, states_no: int,
+                               checkpoints_no: int = 100) -> ndarray:
+    """
+    [i, j] -- share of values equal to i in the first j + 1 of the checkpoints_no
+    (array_split) pieces of requests_in_system_at_time.
+    Every piece is counted once with bincount, the counts are accumulated with cumsum.
+    """
+    values = asarray(requests_in_system_at_time, dtype = int)
+    sizes = full(checkpoints_no, len(values) // checkpoints_no)
+    sizes[:len(values) % checkpoints_no] += 1
+    ends = cumsum(sizes)
+
+    counts = zeros((checkpoints_no, states_no))
+    for j, (start, end) in enumerate(zip(ends - sizes, ends)):
+        counts[j] = bincount(values[start:end], minlength = states_no)[:states_no]
+
+    return (cumsum(counts, axis = 0) / ends[:, None]).T
 
 
 def draw_probabilities_of_amount_of_requests_in_system_histograms(
   requests_in_system_at_time: ndarray,
   theoretical_probs: ndarray):
     #
-    interval_len = 100
-    intervals = array_split(requests_in_system_at_time, interval_len)
-
-    for i in range(1, len(intervals)):
-        intervals[i] = append(intervals[i], intervals[i - 1])
-
-    for i in range(len(theoretical_probs)):
-        interval_probabilities = []
-        for interval in intervals:
-            interval_probabilities.append(len(interval[interval == i]) / len(interval))
-        plt.figure(figsize = (5, 5))
-        plt.bar(range(len(interval_probabilities)), interval_probabilities)
-        plt.title(f"Probability that there is ({i}) requests in system at time")
-        plt.axhline(y = theoretical_probs[i], xmin = 0, xmax = len(interval_probabilities),
-                    color = 'red')
-        plt.show()
+    running_probabilities = find_running_probabilities(requests_in_system_at_time,
+                                                       len(theoretical_probs))
+    states_no, checkpoints_no = running_probabilities.shape
+
+    columns = min(states_no, 4)
+    rows = -(-states_no // columns)
+    fig, axs = plt.subplots(rows, columns, figsize = (5 * columns, 5 * rows), squeeze = False)
+
+    for i, ax in enumerate(axs.flat):
+        if i >= states_no:
+            ax.set_visible(False)
+            continue
+        ax.bar(range(checkpoints_no), running_probabilities[i])
+        ax.set_title(f"Probability that there is ({i}) requests in system at time")
+        ax.axhline(y = theoretical_probs[i], xmin = 0, xmax = checkpoints_no, color = 'red')
@@ -0,0 +1,94 @@
+from typing import Callable
+from typing import Optional
+
+import numpy.random
+from numpy import full
+from numpy import log
+from numpy import ndarray
+from numpy.random import Generator
+from numpy.random import default_rng
+
+
+_block_size = 1 << 14  # variates drawn per refill
+
+"""
+A distribution is a function (rng, size) -> ndarray of size variates.
+"""
+Distribution = Callable[[Generator, int], ndarray]
+
+
+def exponential(mean: float) -> Distribution:
+    return lambda rng, size: rng.exponential(mean, size)
+
+
+def erlang(shape: int, mean: float) -> Distribution:
+    """
+    Sum of shape exponentials, mean in total.
+    """
+    return lambda rng, size: rng.gamma(shape, mean / shape, size)
+
+
+def lognormal(mean: float, sigma: float) -> Distribution:
+    """
+    sigma -- of the underlying normal; its mean is chosen so that the variates have mean.
+    """
+    mu = log(mean) - sigma ** 2 / 2
+    return lambda rng, size: rng.lognormal(mu, sigma, size)
+
+
+def deterministic(value: float) -> Distribution:
+    return lambda rng, size: full(size, float(value))
+
+
+class VariatePool:
+    """
+    Variates of one distribution handed out one at a time from blocks drawn in bulk,
+    so that the NumPy call overhead is paid once per block instead of once per event.
+    The first block is drawn on the first call.
+    """
+
+    def __init__(self, distribution: Distribution, rng: Generator,
+                 block_size: int = _block_size):
+        self._distribution = distribution
+        self._rng = rng
+        self._block_size = block_size
+        self._values = iter(())
+
+
+    def next(self) -> float:
+        try:
+            return next(self._values)
+        except StopIteration:
+            self._values = iter(self._distribution(self._rng, self._block_size).tolist())
+            return next(self._values)
+
+
+class VariateStreams:
+    """
+    The random delays of a QSM: interarrival times, service times and patience (time a
+    request waits in the queue before leaving). Each is a separate pool with its own
+    child generator, so changing one distribution does not shift the others.
+
+    rng -- parent generator; by default it is seeded from the global NumPy state.
+    service, patience -- distributions, exponential with the model's rates by default.
+    """
+
+    def __init__(self
+                 , requests_rt: float
+                 , service_rt: float
+                 , v_param: float
+                 , rng: Optional[Generator] = None
+                 , service: Optional[Distribution] = None
+                 , patience: Optional[Distribution] = None
+                 , block_size: int = _block_size):
+        if rng is None:
+            rng = default_rng(numpy.random.randint(1 << 31, size = 4))
+        if service is None:
+            service = exponential(1.0 / service_rt)
+        if patience is None:
+            patience = exponential(1.0 / v_param) if v_param else deterministic(float('inf'))
+
+        arrivals_rng, service_rng, patience_rng = rng.spawn(3)
+        self.arrivals = VariatePool(exponential(1.0 / requests_rt), arrivals_rng, block_size)
+        self.service = VariatePool(service, service_rng, block_size)
+        self.patience = VariatePool(patience, patience_rng, block_size)
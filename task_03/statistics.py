@@ -0,0 +1,79 @@
+from typing import Tuple
+
+from numpy import array
+
+from task_02 import theory
+from task_02.qsm import QSM
+
+
+def find_empiric_probs(model: QSM) -> Tuple:
+    sts = model.stats
+
+    """
+    Since there are infinite amount of channels, no rejections are possible
+    """
+    requests_passed_total = sts.requests_completed_amount
+
+    """
+    P -- array of probabilities. P[i] is the probability, that
+    req_proc_and_await_at_time[i] < i.
+    """
+    P = []
+    """
+    req_proc_and_await_at_time -- vector, where each component shows how many
+    requests there had been processing and in a queue by the time a new request came.
+    """
+    req_proc_and_await_at_time = array(sts.requests_processing)
+    max_req_proc_and_await_amount = len(req_proc_and_await_at_time)
+    for i in range(1, max_req_proc_and_await_amount + 1):
+        matches = req_proc_and_await_at_time[req_proc_and_await_at_time == i]
+        if prob := (len(matches) / requests_passed_total):
+            P.append(prob)
+
+    """
+    P_rejected -- probability for a request to be rejected.
+    """
+    P_rejected = 0
+
+    """
+    Q -- probability for a request to be processed.
+    """
+    Q = 1 - P_rejected
+
+    """
+    A -- absolute throughput.
+    """
+    A = Q * sts.model.requests_rt
+
+    avg_busy_channels = A / sts.model.service_rt
+
+    avg_req_in_system = sts.get_average_amount_of_requests_in_system_at_time()
+    avg_req_processed = sts.get_average_amount_of_requests_processed_at_time()
+    avg_req_in_queue = 0
+    avg_req_time_in_system = sts.get_average_time_of_request_spent_in_system()
+    avg_req_time_in_queue = 0
+
+    return (P, Q, A, P_rejected, avg_req_in_system, avg_req_in_queue, avg_req_time_in_system,
+            avg_req_time_in_queue, avg_req_processed)
+
+
+def find_theoretical_probs(model: QSM, channels_no: int, max_queue_sz: int) -> Tuple:
+    sts = model.stats
+
+    """
+    P -- p_0..p_n of the M/M/n/m solution with n = channels_no, m = max_queue_sz.
+    """
+    P = list(theory.find_theoretical_probs(channels_no, max_queue_sz, model.requests_rt,
+                                           model.service_rt, model.v_param)[0][:channels_no + 1])
+
+    P_rejected = 0
+    Q = 1
+    A = Q * model.requests_rt
+    avg_req_in_system = model.requests_rt * 1 / model.service_rt
+    avg_req_processed = A / model.service_rt
+    avg_req_in_queue = 0
+    avg_req_time_in_system = 1 / model.service_rt
+    avg_req_time_in_queue = 0
+
+    return (P, Q, A, P_rejected, avg_req_in_system, avg_req_in_queue, avg_req_time_in_system,
+            avg_req_time_in_queue, avg_req_processed)
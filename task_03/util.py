@@ -1,7 +1,5 @@
 from matplotlib import pyplot as plt
-from numpy import append
 from numpy import array
-from numpy import array_split
 from numpy import ndarray
 
 
@@ -32,8 +30,6 @@ def draw_P_comparison_histograms(*args, titles) -> None:
         axs[ind].bar(range(len(P_emp)), P_emp, width = 0.5)
         axs[ind].set_title(titles[ind])
 
-    plt.show()
-
 
 def draw_P_sub_comparison_histograms(*args, titles) -> None:
     amount = len(args)
@@ -46,8 +42,6 @@ def draw_P_sub_comparison_histograms(*args, titles) -> None:
         axs[ind].axhline(y = 0, xmin = 0, xmax = len(P_emp), color = 'red')
         axs[ind].set_title(titles[ind])
 
-    plt.show()
-
 
 def draw_values_comparison_bars(*args, titles):
     amount = len(args)
@@ -59,41 +53,34 @@ def draw_values_comparison_bars(*args, titles):
         axs[ind].axhline(y = actual_expected_pair[1], xmin = 0, xmax = 2, color = 'red')
         axs[ind].set_title(titles[ind])
 
-    plt.show()
 
-
-def draw_probabilities_of_amount_of_requests_in_system_histograms(*args, count):
+def draw_probabilities_of_amount_of_requests_in_system_histograms(*args, states_no):
+    """
+    args -- (running_probabilities, theoretical_probs) pairs, where
+    running_probabilities is the states x checkpoints matrix of
+    task_02.util.find_running_probabilities. One figure: a row per state up to
+    states_no, a column per pair.
+    """
     amount = len(args)
     plt.style.use('default')
-    fig, axs = plt.subplots(1, amount, figsize = (15, 5))
-
-    for ind, (requests_in_system_at_time, theoretical_probs) in enumerate(args):
-        _draw_probabilities_of_amount_of_requests_in_system_histograms(
-          axs[ind]
-          , count
-          , requests_in_system_at_time
-          , theoretical_probs
-        )
+    fig, axs = plt.subplots(states_no, amount, figsize = (15, 4 * states_no), squeeze = False)
 
-    plt.show()
+    for count in range(states_no):
+        for ind, (running_probabilities, theoretical_probs) in enumerate(args):
+            _draw_probabilities_of_amount_of_requests_in_system_histograms(
+              axs[count, ind]
+              , count
+              , running_probabilities[count]
+              , theoretical_probs
+            )
 
 
 def _draw_probabilities_of_amount_of_requests_in_system_histograms(
   axs
   , index
-  , requests_in_system_at_time: ndarray
+  , interval_probabilities: ndarray
   , theoretical_probs: ndarray):
     #
-    interval_len = 100
-    intervals = array_split(requests_in_system_at_time, interval_len)
-
-    for i in range(1, len(intervals)):
-        intervals[i] = append(intervals[i], intervals[i - 1])
-
-    interval_probabilities = []
-    for interval in intervals:
-        interval_probabilities.append(len(interval[interval == index]) / len(interval))
-
     axs.bar(range(len(interval_probabilities)), interval_probabilities)
     axs.set_title(f"Prob. that there is ({index}) req. in system at time")
     axs.axhline(y = theoretical_probs[index], xmin = 0, xmax = len(interval_probabilities),